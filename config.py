@@ -1,47 +1,200 @@
+from dataclasses import dataclass, field
+from functools import lru_cache
 from pathlib import Path
+from types import MappingProxyType
+from typing import Final, Optional
+import atexit
 import os
-from dotenv import load_dotenv
 
-# Load variables from .env file if it exists
-load_dotenv()
+# Directory layout as plain strings; abspath avoids realpath's per-component lstat
+_BASE_DIR_STR: Final = os.path.dirname(os.path.abspath(__file__))
+_DATA_DIR_STR: Final = os.path.join(_BASE_DIR_STR, "data")
+_EXECUTE_DIR_STR: Final = os.path.join(_BASE_DIR_STR, "execute")
+_PARSED_RESULTS_STR: Final = os.path.join(_EXECUTE_DIR_STR, "parsed-results")
+_LLM_RESULTS_STR: Final = os.path.join(_EXECUTE_DIR_STR, "llm-results")
 
-class Config:
+
+def _load_env_fast(path: str = os.path.join(_BASE_DIR_STR, ".env")) -> None:
+    """
+    Load KEY=VALUE lines from a .env file into os.environ.
+
+    Only the .env next to config.py is read. Existing environment variables
+    are never overridden. Blank lines and '#' comments are skipped and
+    surrounding quotes are stripped; no shell expansion is performed.
+    """
+    try:
+        with open(path, 'rb') as f:
+            data = f.read()
+    except OSError:
+        return
+
+    for line in data.splitlines():
+        line = line.strip()
+        if not line or line.startswith(b'#'):
+            continue
+        k, sep, v = line.partition(b'=')
+        if not sep:
+            continue
+        k = k.strip().decode('ascii', 'ignore')
+        v = v.strip().strip(b'"').strip(b"'").decode('utf-8', 'ignore')
+        os.environ.setdefault(k, v)
+
+
+# Load variables from .env file if it exists. Deployments whose environment is
+# provided by the orchestrator can set INTEROP_USE_DOTENV=0 to skip the lookup.
+# This stays synchronous: the environment snapshot below needs the values at
+# import, and output directories are created lazily, so there is no other
+# startup I/O to overlap it with.
+if os.environ.get("INTEROP_USE_DOTENV") != "0":
+    _load_env_fast()
+
+# Environment snapshot, frozen once at import
+_DEFAULT_POPPLER_PATH: Final = r"C:\Users\izgin.ozdas\poppler\poppler-24.08.0\Library\bin"
+_ENV = MappingProxyType(dict(os.environ))
+_POPPLER_PATH: Final = _ENV.get("POPPLER_PATH", _DEFAULT_POPPLER_PATH)
+
+
+def _poppler_tool(poppler_path: str, tool: str) -> str:
+    """Full path of a Poppler executable inside the configured bin folder."""
+    return os.path.join(poppler_path, tool + ".exe" if os.name == "nt" else tool)
+
+
+# Poppler executables, resolved and checked once
+_PDFTOPPM: Final = _poppler_tool(_POPPLER_PATH, "pdftoppm")
+_PDFINFO: Final = _poppler_tool(_POPPLER_PATH, "pdfinfo")
+_POPPLER_FOUND: Final = os.path.isfile(_PDFTOPPM)
+
+# Parser settings; hot loops import these directly (from config import ...)
+STEP_MIN_FACE_AREA: Final[float] = 10.0
+STEP_NUM_SAMPLE_POINTS: Final[int] = 100_000
+STEP_PARALLEL_TOLERANCE: Final[float] = 0.01
+
+
+# Directories already created during this process
+_ENSURED_DIRS: set = set()
+
+
+def _ensure_dir(path: Path) -> Path:
+    """Create a directory on first request only and return it."""
+    key = str(path)
+    if key not in _ENSURED_DIRS:
+        # stat is usually served from the dentry cache; mkdir only when missing
+        try:
+            os.stat(key)
+        except FileNotFoundError:
+            os.makedirs(key, exist_ok=True)
+        _ENSURED_DIRS.add(key)
+    return path
+
+
+# Open directory descriptors for dir_fd-relative writes, keyed by subdirectory
+_HAS_DIR_FD: Final = hasattr(os, "O_DIRECTORY") and os.open in os.supports_dir_fd
+_PARSED_DIR_FDS: dict = {}
+
+
+@atexit.register
+def _close_dir_fds() -> None:
+    """Close every directory descriptor opened by Config.parsed_dir_fd."""
+    for fd in _PARSED_DIR_FDS.values():
+        os.close(fd)
+    _PARSED_DIR_FDS.clear()
+
+
+@lru_cache(maxsize=64)
+def _subdir_path(root: str, subdirectory: str) -> Path:
+    """Build (once) the Path for a subdirectory of one of the layout roots."""
+    return Path(os.path.join(root, subdirectory))
+
+
+@dataclass(frozen=True, slots=True)
+class _Config:
     """Central configuration for the DXF Interoperability Project."""
     
-    # Base Directories
-    BASE_DIR = Path(__file__).resolve().parent
-    DATA_DIR = BASE_DIR / "data"
-    EXECUTE_DIR = BASE_DIR / "execute"
+    # Base Directories (plain strings; use BASE_PATH for the Path API)
+    BASE_DIR: str = _BASE_DIR_STR
+    BASE_PATH: Path = Path(_BASE_DIR_STR)
+    DATA_DIR: str = _DATA_DIR_STR
+    EXECUTE_DIR: str = _EXECUTE_DIR_STR
     
     # Output Directories
-    PARSED_RESULTS_DIR = EXECUTE_DIR / "parsed-results"
-    LLM_RESULTS_DIR = EXECUTE_DIR / "llm-results"
-    
-    # Ensure directories exist
-    PARSED_RESULTS_DIR.mkdir(parents=True, exist_ok=True)
-    LLM_RESULTS_DIR.mkdir(parents=True, exist_ok=True)
+    PARSED_RESULTS_DIR: str = _PARSED_RESULTS_STR
+    LLM_RESULTS_DIR: str = _LLM_RESULTS_STR
     
     # Settings
-    CAM_SOFTWARE = "CypCut"
+    CAM_SOFTWARE: str = "CypCut"
     
     # Parser Settings
-    STEP_MIN_FACE_AREA = 10.0
-    STEP_NUM_SAMPLE_POINTS = 100000
-    STEP_PARALLEL_TOLERANCE = 0.01
+    STEP_MIN_FACE_AREA: float = STEP_MIN_FACE_AREA
+    STEP_NUM_SAMPLE_POINTS: int = STEP_NUM_SAMPLE_POINTS
+    STEP_PARALLEL_TOLERANCE: float = STEP_PARALLEL_TOLERANCE
 
     # External Tools
     # Read from .env, with your specific machine path as a fallback
-    POPPLER_PATH = os.getenv(
-        "POPPLER_PATH", 
-        r"C:\Users\izgin.ozdas\poppler\poppler-24.08.0\Library\bin"
+    POPPLER_PATH: str = _POPPLER_PATH
+    PDFTOPPM: str = _PDFTOPPM
+    PDFINFO: str = _PDFINFO
+    # False when pdftoppm is not in POPPLER_PATH; pdf2image then searches PATH
+    POPPLER_FOUND: bool = _POPPLER_FOUND
+    
+    # Read-only dict view of the scalar settings, for workers that read many keys
+    SNAPSHOT: MappingProxyType = field(init=False, repr=False, compare=False)
+    
+    _SNAPSHOT_KEYS = (
+        "CAM_SOFTWARE", "STEP_MIN_FACE_AREA", "STEP_NUM_SAMPLE_POINTS",
+        "STEP_PARALLEL_TOLERANCE", "POPPLER_PATH",
     )
     
-    @classmethod
-    def get_input_dir(cls, subdirectory: str) -> Path:
+    def __post_init__(self) -> None:
+        self._refresh_snapshot()
+    
+    def _refresh_snapshot(self) -> None:
+        snapshot = MappingProxyType({k: getattr(self, k) for k in self._SNAPSHOT_KEYS})
+        object.__setattr__(self, "SNAPSHOT", snapshot)
+    
+    def reload_env(self) -> None:
+        """Re-snapshot os.environ and refresh the environment-derived settings."""
+        global _ENV
+        _ENV = MappingProxyType(dict(os.environ))
+        poppler_path = _ENV.get("POPPLER_PATH", _DEFAULT_POPPLER_PATH)
+        pdftoppm = _poppler_tool(poppler_path, "pdftoppm")
+        object.__setattr__(self, "POPPLER_PATH", poppler_path)
+        object.__setattr__(self, "PDFTOPPM", pdftoppm)
+        object.__setattr__(self, "PDFINFO", _poppler_tool(poppler_path, "pdfinfo"))
+        object.__setattr__(self, "POPPLER_FOUND", os.path.isfile(pdftoppm))
+        self._refresh_snapshot()
+    
+    def get_input_dir(self, subdirectory: str) -> Path:
         """Get the full path for an input subdirectory (e.g., 'teknocer')."""
-        return cls.DATA_DIR / subdirectory
+        return _subdir_path(_DATA_DIR_STR, subdirectory)
 
-    @classmethod
-    def get_output_dir(cls, subdirectory: str) -> Path:
+    def parsed_results_dir(self) -> Path:
+        """Get the parsed results root, creating it on first use."""
+        return _ensure_dir(_subdir_path(_EXECUTE_DIR_STR, "parsed-results"))
+
+    def get_output_dir(self, subdirectory: str) -> Path:
         """Get the full path for output results for a subdirectory."""
-        return cls.PARSED_RESULTS_DIR / subdirectory
+        return _ensure_dir(_subdir_path(_PARSED_RESULTS_STR, subdirectory))
+
+    def parsed_dir_fd(self, subdirectory: str) -> Optional[int]:
+        """
+        Get an open descriptor for a parsed-results subdirectory.
+
+        Writers pass it as dir_fd= to os.open so the kernel does not re-resolve
+        the directory path for every file. Returns None where dir_fd is not
+        supported (e.g. Windows); callers then fall back to full paths.
+        """
+        if not _HAS_DIR_FD:
+            return None
+        fd = _PARSED_DIR_FDS.get(subdirectory)
+        if fd is None:
+            path = self.get_output_dir(subdirectory)
+            fd = _PARSED_DIR_FDS[subdirectory] = os.open(path, os.O_RDONLY | os.O_DIRECTORY)
+        return fd
+
+    def get_llm_results_dir(self, subdirectory: str) -> Path:
+        """Get the full path for LLM results for a subdirectory."""
+        return _ensure_dir(_subdir_path(_LLM_RESULTS_STR, subdirectory))
+
+
+# Module-level singleton; import as `from config import Config`
+Config = _Config()
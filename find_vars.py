@@ -1,23 +1,37 @@
+import mmap
 from pathlib import Path
 
+CHUNK_SIZE = 1 << 20
+
 def find_user_vars():
     path = Path(r"c:\Users\izgin.ozdas\OneDrive - Accenture\Documents\Thesis\interoperability-poc1\data\teknocer\P12-D013-01.DXF")
-    txt = path.read_text(encoding="utf-8", errors="ignore")
-    lines = txt.splitlines()
-    
-    print(f"Total lines: {len(lines)}")
-    
-    found_any = False
-    for i, line in enumerate(lines):
-        if "$USER" in line:
-            print(f"Line {i+1}: {line}")
+    if path.stat().st_size == 0:
+        print("Total lines: 0")
+        print("No lines containing '$USER' found.")
+        return
+
+    # Search the mapped bytes directly instead of decoding and splitting the whole file
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        size = len(mm)
+        total = sum(mm[k:k + CHUNK_SIZE].count(b"\n") for k in range(0, size, CHUNK_SIZE))
+        if mm[size - 1:] != b"\n":
+            total += 1
+        print(f"Total lines: {total}")
+
+        found_any = False
+        pos = 0
+        line_no = 1
+        while (i := mm.find(b"$USER", pos)) != -1:
+            line_start = mm.rfind(b"\n", 0, i) + 1
+            line_end = mm.find(b"\n", i)
+            if line_end == -1:
+                line_end = size
+            line_no += mm[pos:line_start].count(b"\n")
+            line = mm[line_start:line_end].rstrip(b"\r").decode("utf-8", errors="ignore")
+            print(f"Line {line_no}: {line}")
             found_any = True
-            # Print context lines
-            start = max(0, i-5)
-            end = min(len(lines), i+10)
-            # print("\n".join(lines[start:end]))
-            # print("-" * 20)
-            
+            pos = line_end
+
     if not found_any:
         print("No lines containing '$USER' found.")
 
@@ -8,18 +8,121 @@ This script takes the parsed data from the master parser and uses LLM to:
 3. Validate metadata consistency across QIF and STEP sources
 4. Generate unified DXF annotation JSON instructions for each part
 5. Output JSON files with annotation instructions (does not modify original DXF files)
+"""
 
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+import hashlib
 import json
 import openai
+import os
 from pathlib import Path
+import re
 import sys
+import time
 from typing import Union, List, Dict
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 # Configuration
 PARSED_RESULTS_DIR = Path("execute/parsed-results")
 LLM_RESULTS_DIR = Path("execute/RAG+Zero-Shot/llm-results-rag")
 LLM_INPUTS_RAG_ZS_DIR = Path("execute/RAG+Zero-Shot/llm-inputs-rag-zs")
 CAM = "CypCut"  # Default CAM software
+MODEL = os.getenv("LLM_MODEL", "gpt-4o-mini")
+# Asked once more when MODEL's reply cannot be parsed or does not match ANNOTATION_SCHEMA
+FALLBACK_MODEL = os.getenv("LLM_FALLBACK_MODEL", "gpt-4o")
+
+# Model families that accept response_format={"type": "json_object"}; others
+# (e.g. gpt-4) reject it, so their replies are parsed from markdown fences
+JSON_MODE_MODEL_PREFIXES = ("gpt-4o", "gpt-4.1", "gpt-4-turbo", "gpt-4-1106", "gpt-4-0125",
+                            "gpt-3.5-turbo", "gpt-5", "o1", "o3", "o4")
+SYSTEM_PROMPT = "You are a DXF annotation expert. Your job is to follow the given instructions and return a valid JSON object following the instructions provided."
+
+# Exact-match response cache, so re-runs over unchanged inputs skip the API
+CACHE_DIR = LLM_RESULTS_DIR / ".cache"
+CACHE_TTL_SECONDS = 7 * 86400
+
+# Header variables the placement rules ask about, and how many layer names to show
+PLACEMENT_HEADER_VARS = ("$USERR1", "$USERI1")
+MAX_CONTEXT_LAYERS = 20
+
+# Markdown ```json fence around a reply, any {...} span in a reply, and the number in a thickness value
+JSON_FENCE_RE = re.compile(r'```(?:json)?\s*(\{.*?\})\s*```', re.DOTALL)
+JSON_OBJECT_RE = re.compile(r'(\{.*\})', re.DOTALL)
+THICKNESS_RE = re.compile(r'(\d+\.?\d*)')
+
+# In-flight LLM request cap
+MAX_CONCURRENT_REQUESTS = 16
+
+# Worker threads for reading parsed JSON/TXT files
+MAX_LOAD_WORKERS = 16
+
+_client = None
+_semaphore = None
+
+def get_client() -> openai.AsyncOpenAI:
+    """Return the shared AsyncOpenAI client, creating it on first use."""
+    global _client
+    if _client is None:
+        import httpx  # installed with openai
+        # One pooled client for the whole run, with enough keep-alive
+        # connections that concurrent requests don't redo TLS handshakes
+        _client = openai.AsyncOpenAI(
+            http_client=openai.DefaultAsyncHttpxClient(
+                limits=httpx.Limits(
+                    max_connections=100,
+                    max_keepalive_connections=MAX_CONCURRENT_REQUESTS
+                )
+            )
+        )
+    return _client
+
+_cache_stats = {"hits": 0, "misses": 0}
+
+def cache_path(prompt: str) -> Path:
+    """Cache file for a prompt, keyed by SHA-256 of the models, system prompt and prompt.
+    
+    Both MODEL and FALLBACK_MODEL are part of the key, since either may have
+    produced the cached reply. Near matches are deliberately not reused:
+    prompts for parts sharing material/thickness differ in part ID, which
+    ends up in the instructions.
+    """
+    key = hashlib.sha256(f"{MODEL}\0{FALLBACK_MODEL}\0{SYSTEM_PROMPT}\0{prompt}".encode("utf-8")).hexdigest()
+    return CACHE_DIR / key[:2] / key[2:]
+
+def load_cached_response(path: Path):
+    """Return (instructions, model that answered) if cached and not expired, else None."""
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            entry = json.load(f)
+        if time.time() < entry["expires_at"]:
+            return entry["response"], entry["model"]
+    except (OSError, ValueError, KeyError, TypeError):
+        pass
+    return None
+
+def save_cached_response(path: Path, response: dict, model: str):
+    """Atomically write a response, tagged with the model that answered; failures are not fatal."""
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({"response": response, "model": model,
+                       "expires_at": time.time() + CACHE_TTL_SECONDS}, f)
+        os.replace(tmp_path, path)
+    except OSError as e:
+        print(f"⚠️ Could not write LLM cache entry {path}: {e}")
+
+def get_semaphore() -> asyncio.Semaphore:
+    """Return the shared semaphore that caps concurrent LLM requests."""
+    global _semaphore
+    if _semaphore is None:
+        _semaphore = asyncio.Semaphore(MAX_CONCURRENT_REQUESTS)
+    return _semaphore
 
 PROMPT_TEMPLATE = """
 You are a DXF annotation expert. Your job is to add manufacturing metadata to DXF files.
@@ -81,39 +184,143 @@ IMPORTANT VALUE RULES:
 RETURN ONLY THE JSON OBJECT
 """
 
-def ask_llm(prompt: str) -> dict:
+# Expected shape of the annotation instructions (the OUTPUT FORMAT in PROMPT_TEMPLATE)
+ANNOTATION_SCHEMA = {
+    "type": "object",
+    "required": ["header_updates", "add_comments"],
+    "properties": {
+        "header_updates": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "required": ["var", "gcode", "value", "placement"],
+                "properties": {
+                    "var": {"type": "string"},
+                    "gcode": {"type": "integer", "enum": [40, 70]},
+                    "value": {"type": "number"},
+                    "placement": {"type": "string", "enum": ["update_existing", "before_endsec"]}
+                }
+            }
+        },
+        "add_comments": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "required": ["comment", "placement"],
+                "properties": {
+                    "comment": {"type": "string"},
+                    "placement": {"type": "string"}
+                }
+            }
+        }
+    }
+}
+
+_JSON_TYPES = {
+    "object": dict,
+    "array": list,
+    "string": str,
+    "integer": int,
+    "number": (int, float),
+}
+
+def _check_schema(value, schema: dict, path: str = "data"):
+    """Minimal validator for the JSON Schema subset used by ANNOTATION_SCHEMA."""
+    expected = schema.get("type")
+    if expected and (not isinstance(value, _JSON_TYPES[expected]) or isinstance(value, bool)):
+        raise ValueError(f"{path} must be {expected}")
+    if "enum" in schema and value not in schema["enum"]:
+        raise ValueError(f"{path} must be one of {schema['enum']}")
+    if expected == "object":
+        for key in schema.get("required", []):
+            if key not in value:
+                raise ValueError(f"{path} must contain ['{key}'] property")
+        properties = schema.get("properties", {})
+        for key, item in value.items():
+            if key in properties:
+                _check_schema(item, properties[key], f"{path}.{key}")
+            elif schema.get("additionalProperties") is False:
+                raise ValueError(f"{path} must not contain '{key}' property")
+    elif expected == "array" and "items" in schema:
+        for i, item in enumerate(value):
+            _check_schema(item, schema["items"], f"{path}[{i}]")
+
+def validate_instructions(instructions) -> None:
+    """Raise ValueError unless instructions match ANNOTATION_SCHEMA and set both header variables."""
+    _check_schema(instructions, ANNOTATION_SCHEMA)
+    header_vars = {update["var"] for update in instructions["header_updates"]}
+    for var in PLACEMENT_HEADER_VARS:
+        if var not in header_vars:
+            raise ValueError(f"data.header_updates must contain an entry for {var}")
+
+def completion_options(model: str) -> dict:
+    """Extra chat completion arguments for model: JSON mode where it is supported."""
+    if model.startswith(JSON_MODE_MODEL_PREFIXES):
+        return {"response_format": {"type": "json_object"}}
+    return {}
+
+def parse_llm_content(content: str) -> dict:
+    """Parse annotation instructions from a (stripped, non-empty) LLM reply."""
+    # A bare JSON object needs no regex scan
+    if content.startswith('{'):
+        try:
+            return json.loads(content)
+        except json.JSONDecodeError:
+            pass
+    
+    # Try to extract JSON from markdown code blocks if present
+    json_match = JSON_FENCE_RE.search(content)
+    if not json_match:
+        # Try to find JSON object in the content (look for opening brace to closing brace)
+        json_match = JSON_OBJECT_RE.search(content)
+    if json_match:
+        return json.loads(json_match.group(1))
+    
+    # If no JSON found, try to parse the entire content as JSON
+    return json.loads(content)
+
+async def ask_llm_async(prompt: str) -> dict:
     """Call the LLM API to get DXF annotation instructions."""
-    client = openai.OpenAI()
+    cached_path = cache_path(prompt)
+    cached = load_cached_response(cached_path)
+    if cached is not None:
+        _cache_stats["hits"] += 1
+        instructions, model = cached
+        print(f"LLM Response: (cache hit, from {model})")
+        return instructions
+    _cache_stats["misses"] += 1
+    
+    client = get_client()
+    content = ""
+    models = list(dict.fromkeys((MODEL, FALLBACK_MODEL)))
     try:
-        response = client.chat.completions.create(
-            model="gpt-4",
-            messages=[
-                { "role": "system", "content": "You are a DXF annotation expert. Your job is to follow the given instructions and return a valid JSON object following the instructions provided." },
-                { "role": "user", "content": prompt }
-            ],
-            temperature=0.2,
-        )
-        content = response.choices[0].message.content.strip()
-        print(f"LLM Response: {content[:200]}...")  # Show first 200 chars
-        
-        if not content:
-            raise ValueError("LLM returned empty response")
-        
-        # Try to extract JSON from markdown code blocks if present
-        import re
-        json_match = re.search(r'```(?:json)?\s*(\{.*?\})\s*```', content, re.DOTALL)
-        if json_match:
-            json_content = json_match.group(1)
-            return json.loads(json_content)
-        
-        # Try to find JSON object in the content (look for opening brace to closing brace)
-        json_match = re.search(r'(\{.*\})', content, re.DOTALL)
-        if json_match:
-            json_content = json_match.group(1)
-            return json.loads(json_content)
+        for attempt, model in enumerate(models):
+            async with get_semaphore():
+                response = await client.chat.completions.create(
+                    model=model,
+                    messages=[
+                        { "role": "system", "content": SYSTEM_PROMPT },
+                        { "role": "user", "content": prompt }
+                    ],
+                    temperature=0.2,
+                    **completion_options(model),
+                )
+            content = (response.choices[0].message.content or "").strip()
+            print(f"LLM Response: {content[:200]}...")  # Show first 200 chars
+            
+            try:
+                if not content:
+                    raise ValueError("LLM returned empty response")
+                instructions = parse_llm_content(content)
+                validate_instructions(instructions)
+                break
+            except ValueError as e:  # Includes json.JSONDecodeError
+                if attempt == len(models) - 1:
+                    raise
+                print(f"⚠️ Unusable reply from {model} ({e}), asking {models[attempt + 1]}")
         
-        # If no JSON found, try to parse the entire content as JSON
-        return json.loads(content)
+        save_cached_response(cached_path, instructions, model)
+        return instructions
         
     except json.JSONDecodeError as e:
         print(f"JSON Decode Error: {e}")
@@ -123,6 +330,40 @@ def ask_llm(prompt: str) -> dict:
         print(f"LLM API Error: {e}")
         raise
 
+def read_json_file(path: Path):
+    """Read and parse one JSON file (orjson when available)."""
+    with open(path, 'rb') as f:
+        raw = f.read()
+    return orjson.loads(raw) if orjson else json.loads(raw)
+
+def dump_json(obj, indent: bool = True) -> bytes:
+    """Serialize to UTF-8 JSON bytes, indented or compact (orjson when available)."""
+    if orjson:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2 if indent else 0)
+    if indent:
+        return json.dumps(obj, indent=2, ensure_ascii=False).encode("utf-8")
+    return json.dumps(obj, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+
+def read_txt_file(path: Path) -> str:
+    """Read one UTF-8 text file."""
+    with open(path, 'r', encoding='utf-8') as f:
+        return f.read()
+
+def load_files_parallel(paths: dict, reader, label: str) -> dict:
+    """Read {part_name: path} concurrently with reader; failed files are reported and skipped."""
+    loaded = {}
+    if not paths:
+        return loaded
+    with ThreadPoolExecutor(max_workers=min(MAX_LOAD_WORKERS, len(paths))) as executor:
+        futures = {part_name: executor.submit(reader, path) for part_name, path in paths.items()}
+        for part_name, future in futures.items():
+            try:
+                loaded[part_name] = future.result()
+                print(f"✅ Loaded {label} data for {part_name}")
+            except Exception as e:
+                print(f"❌ Error loading {label} {paths[part_name]}: {e}")
+    return loaded
+
 def load_parsed_data(subdirectory: str) -> dict:
     """Load all parsed data for a subdirectory."""
     data_dir = PARSED_RESULTS_DIR / subdirectory
@@ -131,44 +372,23 @@ def load_parsed_data(subdirectory: str) -> dict:
         print(f"❌ Parsed results directory not found: {data_dir}")
         return {}
     
-    all_data = {}
-    
-    # Load all JSON files (excluding DXF and summary files)
+    # Collect all JSON files (excluding DXF and summary files)
+    json_paths = {}
     for json_file in data_dir.glob("*.json"):
         part_name = json_file.stem
         
         # Skip summary and DXF files (we'll handle DXF separately)
         if part_name.endswith("_summary") or part_name.endswith("_dxf"):
             continue
-            
-        try:
-            with open(json_file, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-                all_data[part_name] = data
-                print(f"✅ Loaded JSON data for {part_name}")
-        except Exception as e:
-            print(f"❌ Error loading {json_file}: {e}")
+        json_paths[part_name] = json_file
     
-    return all_data
+    return load_files_parallel(json_paths, read_json_file, "JSON")
 
 def load_txt_data(subdirectory: str) -> dict:
     """Load TXT files for additional context."""
     data_dir = PARSED_RESULTS_DIR / subdirectory
-    txt_data = {}
-    
-    # Load TXT files
-    for txt_file in data_dir.glob("*.txt"):
-        part_name = txt_file.stem
-        
-        try:
-            with open(txt_file, 'r', encoding='utf-8') as f:
-                content = f.read()
-                txt_data[part_name] = content
-                print(f"✅ Loaded TXT data for {part_name}")
-        except Exception as e:
-            print(f"❌ Error loading TXT {txt_file}: {e}")
-    
-    return txt_data
+    txt_paths = {txt_file.stem: txt_file for txt_file in data_dir.glob("*.txt")}
+    return load_files_parallel(txt_paths, read_txt_file, "TXT")
 
 def validate_metadata_consistency(part_name: str, part_data: dict) -> tuple[bool, dict, str]:
     """
@@ -216,9 +436,8 @@ def validate_metadata_consistency(part_name: str, part_data: dict) -> tuple[bool
         thickness_str = str(thickness_value).lower()
         
         # Remove common units and extract number
-        import re
         # Match numbers with optional decimal places, followed by optional units
-        match = re.search(r'(\d+\.?\d*)', thickness_str)
+        match = THICKNESS_RE.search(thickness_str)
         if match:
             return float(match.group(1))
         return None
@@ -294,47 +513,78 @@ def load_dxf_json(part_name: str, subdirectory: str) -> dict:
         return {"error": f"No DXF JSON found for {part_name}"}
     
     try:
-        with open(dxf_json_path, 'r', encoding='utf-8') as f:
-            dxf_structure = json.load(f)
+        dxf_structure = read_json_file(dxf_json_path)
         print(f"✅ Loaded DXF JSON for {part_name}")
         return dxf_structure
     except Exception as e:
         print(f"❌ Error loading DXF JSON for {part_name}: {e}")
         return {"error": f"Failed to load DXF JSON: {e}"}
 
-def load_rag_json_context(part_name: str, subdirectory: str) -> dict:
-    """Load the JSON context from the llm-inputs-rag-zs directory in respective subdirectories."""
+def build_rag_index(subdirectory: str, part_names) -> Union[Dict[str, Path], None]:
+    """Map each part name to its RAG JSON context file, listing the directory once.
+    
+    Returns None when the subdirectory does not exist; parts without a match
+    are left out.
+    """
     # Look in the specific subdirectory (AutoCAD or Inventor)
     subdir_path = LLM_INPUTS_RAG_ZS_DIR / subdirectory
     
     if not subdir_path.exists():
+        return None
+    
+    with os.scandir(subdir_path) as entries:
+        json_names = [entry.name for entry in entries if entry.name.endswith(".json")]
+    
+    index = {}
+    for part_name in part_names:
+        matches = [name for name in json_names if part_name in name]
+        # Prefer files with the _material_traces.json suffix, then any other JSON
+        traces = [name for name in matches if name.endswith("_material_traces.json")]
+        if traces or matches:
+            # Use the first matching file
+            index[part_name] = subdir_path / (traces or matches)[0]
+    return index
+
+def load_rag_json_context(part_name: str, subdirectory: str, rag_index: Union[Dict[str, Path], None]) -> dict:
+    """Load the JSON context from the llm-inputs-rag-zs directory in respective subdirectories."""
+    if rag_index is None:
         print(f"❌ Subdirectory {subdirectory} not found in {LLM_INPUTS_RAG_ZS_DIR}")
         return {"error": f"Subdirectory {subdirectory} not found"}
     
-    # Look for files that match the part_name pattern with _material_traces.json suffix
-    rag_files = list(subdir_path.glob(f"*{part_name}*_material_traces.json"))
+    rag_json_path = rag_index.get(part_name)
     
-    if not rag_files:
-        # Try alternative patterns
-        rag_files = list(subdir_path.glob(f"*{part_name}*.json"))
-    
-    if not rag_files:
-        print(f"❌ No RAG JSON context found for {part_name} in {subdir_path}")
+    if rag_json_path is None:
+        print(f"❌ No RAG JSON context found for {part_name} in {LLM_INPUTS_RAG_ZS_DIR / subdirectory}")
         return {"error": f"No RAG JSON context found for {part_name} in {subdirectory}"}
     
-    # Use the first matching file
-    rag_json_path = rag_files[0]
-    
     try:
-        with open(rag_json_path, 'r', encoding='utf-8') as f:
-            rag_context = json.load(f)
+        rag_context = read_json_file(rag_json_path)
         print(f"✅ Loaded RAG JSON context for {part_name} from {rag_json_path.name}")
         return rag_context
     except Exception as e:
         print(f"❌ Error loading RAG JSON context for {part_name}: {e}")
         return {"error": f"Failed to load RAG JSON context: {e}"}
 
-def process_part(part_name: str, part_data: dict, txt_data: dict, subdirectory: str) -> dict:
+def slim_rag_context(rag_context: dict, dxf_structure: dict) -> dict:
+    """Reduce the DXF/RAG context to what the prompt rules use.
+    
+    Header variables are cut down to PLACEMENT_HEADER_VARS, listed only when
+    present (the rules treat a listed variable as existing), and taken from
+    the DXF structure when the RAG context has none. Layers are capped at
+    MAX_CONTEXT_LAYERS; other RAG keys (material traces) are kept.
+    """
+    slim = dict(rag_context)
+    header_variables = rag_context.get("header_variables", dxf_structure.get("header_variables", {}))
+    slim["header_variables"] = {
+        var: header_variables[var] for var in PLACEMENT_HEADER_VARS if var in header_variables
+    }
+    layers = rag_context.get("layers", dxf_structure.get("layers"))
+    if layers:
+        slim["layers"] = layers[:MAX_CONTEXT_LAYERS]
+    return slim
+
+async def process_part_async(part_name: str, part_data: dict, txt_data: dict, subdirectory: str,
+                             rag_index: Union[Dict[str, Path], None]) -> dict:
     """Process a single part and generate LLM response."""
     print(f"\nProcessing part: {part_name}")
     
@@ -352,7 +602,8 @@ def process_part(part_name: str, part_data: dict, txt_data: dict, subdirectory:
         return error_result
     
     # Load DXF JSON from parsed results for RAG context
-    dxf_structure = load_dxf_json(part_name, subdirectory)
+    # File reads run in worker threads so other parts' LLM calls keep the event loop busy
+    dxf_structure = await asyncio.to_thread(load_dxf_json, part_name, subdirectory)
     
     if "error" in dxf_structure:
         print(f"❌ Error loading DXF JSON: {dxf_structure['error']}")
@@ -361,7 +612,7 @@ def process_part(part_name: str, part_data: dict, txt_data: dict, subdirectory:
     print(f"✅ Loaded DXF JSON structure for RAG context")
     
     # Load RAG JSON context (optional)
-    rag_context = load_rag_json_context(part_name, subdirectory)
+    rag_context = await asyncio.to_thread(load_rag_json_context, part_name, subdirectory, rag_index)
     
     if "error" in rag_context:
         print(f"⚠️  Warning: RAG JSON context not available: {rag_context['error']}")
@@ -385,15 +636,16 @@ def process_part(part_name: str, part_data: dict, txt_data: dict, subdirectory:
         pdf_csv_text += f"--- TXT CONTENT ---\n"
         pdf_csv_text += txt_data[part_name] + "\n\n"
     
-    # Prepare data for LLM
-    unified_json = json.dumps(unified_metadata, indent=2)
-    dxf_json = json.dumps(dxf_structure, indent=2)
-    rag_json_context = json.dumps(rag_context, indent=2)
+    # Prepare data for LLM; the full unified metadata goes in once, and the STEP
+    # slot only repeats the fields STEP contributes to it
+    unified_json = dump_json(unified_metadata).decode("utf-8")
+    step_json = dump_json({key: unified_metadata[key] for key in ("thickness", "part_id")}, indent=False).decode("utf-8")
+    rag_json_context = dump_json(slim_rag_context(rag_context, dxf_structure), indent=False).decode("utf-8")
     
     # Create prompt
     prompt = PROMPT_TEMPLATE.format(
         qif_metadata=unified_json,
-        step_metadata=unified_json,
+        step_metadata=step_json,
         pdf_csv_text=pdf_csv_text if pdf_csv_text else "No PDF/CSV text available",
         rag_json_context=rag_json_context,  # This now represents the DXF structure in the prompt
         cam=CAM
@@ -401,7 +653,7 @@ def process_part(part_name: str, part_data: dict, txt_data: dict, subdirectory:
     
     # Call LLM
     try:
-        result = ask_llm(prompt)
+        result = await ask_llm_async(prompt)
         return result
     except Exception as e:
         print(f"❌ Error processing {part_name}: {e}")
@@ -409,7 +661,7 @@ def process_part(part_name: str, part_data: dict, txt_data: dict, subdirectory:
             "error": str(e)
         }
 
-def main():
+async def main():
     """Main function to process all parts."""
     print("🚀 COMBINED LLM RAG - Processing all parsed data")
     print("=" * 60)
@@ -426,31 +678,37 @@ def main():
     output_dir = LLM_RESULTS_DIR / subdirectory
     output_dir.mkdir(parents=True, exist_ok=True)
     
-    # Load all parsed data
-    print(f"\nLoading parsed data from: {PARSED_RESULTS_DIR / subdirectory}")
-    parsed_data = load_parsed_data(subdirectory)
+    # Load all parsed data and the TXT data side by side
+    print(f"\nLoading parsed and TXT data from: {PARSED_RESULTS_DIR / subdirectory}")
+    parsed_data, txt_data = await asyncio.gather(
+        asyncio.to_thread(load_parsed_data, subdirectory),
+        asyncio.to_thread(load_txt_data, subdirectory)
+    )
     
     if not parsed_data:
         print("❌ No parsed data found!")
         return False
     
-    # Load TXT data
-    print(f"\nLoading TXT data...")
-    txt_data = load_txt_data(subdirectory)
-    
-    # Process each part
+    # Process all parts concurrently
     print(f"\nProcessing {len(parsed_data)} parts...")
     results = {}
     
-    for part_name, part_data in parsed_data.items():
+    # Match every part to its RAG context file in one pass over the directory
+    rag_index = build_rag_index(subdirectory, parsed_data)
+    
+    tasks = [process_part_async(name, data, txt_data, subdirectory, rag_index) for name, data in parsed_data.items()]
+    results_list = await asyncio.gather(*tasks, return_exceptions=True)
+    
+    for part_name, result in zip(parsed_data, results_list):
         try:
-            result = process_part(part_name, part_data, txt_data, subdirectory)
+            if isinstance(result, BaseException):
+                raise result
             results[part_name] = result
             
             # Save individual result
             output_path = output_dir / f"{part_name}_llm_response.json"
-            with open(output_path, 'w', encoding='utf-8') as f:
-                json.dump(result, f, indent=2, ensure_ascii=False)
+            with open(output_path, 'wb') as f:
+                f.write(dump_json(result))
             print(f"✅ Saved LLM response: {output_path.name}")
             
         except Exception as e:
@@ -459,8 +717,8 @@ def main():
     
     # Save combined results
     combined_output_path = output_dir / f"{subdirectory}_all_llm_responses.json"
-    with open(combined_output_path, 'w', encoding='utf-8') as f:
-        json.dump(results, f, indent=2, ensure_ascii=False)
+    with open(combined_output_path, 'wb') as f:
+        f.write(dump_json(results))
     
     # Print summary
     success_count = sum(1 for r in results.values() if "error" not in r)
@@ -475,11 +733,15 @@ def main():
     print(f"Errors: {error_count}")
     print(f"Output location: {output_dir}")
     print(f"Combined results: {combined_output_path.name}")
+    print(f"LLM cache: {_cache_stats['hits']} hits, {_cache_stats['misses']} misses")
+    
+    if _client is not None:
+        await _client.close()
     
     return error_count == 0
 
 
 
 if __name__ == "__main__":
-    success = main()
+    success = asyncio.run(main())
     sys.exit(0 if success else 1) 
\ No newline at end of file
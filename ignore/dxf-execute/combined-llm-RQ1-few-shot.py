@@ -7,18 +7,221 @@ This script takes the parsed data from the master parser and uses LLM to:
 3. Validate metadata consistency across QIF and STEP sources
 4. Generate unified DXF annotation JSON instructions for each part
 5. Output JSON files with annotation instructions (does not modify original DXF files)
+"""
 
-
+import argparse
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+import hashlib
 import json
+import logging
 import openai
+import os
 from pathlib import Path
+import random
+import re
 import sys
+import time
+
+try:
+    import fastjsonschema
+except ImportError:
+    fastjsonschema = None
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
+
+logger = logging.getLogger(__name__)
 
 # Configuration
 PARSED_RESULTS_DIR = Path("execute/parsed-results")
 LLM_RESULTS_DIR = Path("execute/Zero-Shot/llm-results-zeroshot")
 LLM_RESULTS_DIR.mkdir(parents=True, exist_ok=True)
 CAM = "CypCut"  # Default CAM software
+MODEL = os.getenv("LLM_MODEL", "gpt-4o-mini")
+
+# Model families that accept response_format={"type": "json_object"}; others
+# (e.g. gpt-4) reject it, so their replies are parsed from markdown fences
+JSON_MODE_MODEL_PREFIXES = ("gpt-4o", "gpt-4.1", "gpt-4-turbo", "gpt-4-1106", "gpt-4-0125",
+                            "gpt-3.5-turbo", "gpt-5", "o1", "o3", "o4")
+
+# Exact-match response cache, so re-runs over unchanged inputs skip the API
+CACHE_DIR = LLM_RESULTS_DIR / ".cache"
+CACHE_TTL_SECONDS = 7 * 86400
+
+# Rate limits (conservative gpt-4 tier defaults) and in-flight request cap
+MAX_REQUESTS_PER_MINUTE = 500
+MAX_TOKENS_PER_MINUTE = 90000
+MAX_CONCURRENT_REQUESTS = 16
+
+# Expected reply size for one part's instructions; TPM limits count completion
+# tokens too, so this is charged to the token bucket along with the prompt
+COMPLETION_TOKENS_PER_PART = 400
+
+# Retry settings for transient API failures (429, 5xx, connection errors)
+MAX_ATTEMPTS = 8
+RETRY_MIN_WAIT = 1
+RETRY_MAX_WAIT = 60
+
+# Markdown ```json fence around a reply, and the number in a thickness value
+JSON_FENCE_RE = re.compile(r'```(?:json)?\s*(\{.*?\})\s*```', re.DOTALL)
+THICKNESS_RE = re.compile(r'(\d+\.?\d*)')
+DIGITS_RE = re.compile(r'\d+')
+
+# Re-asks when a reply is not valid JSON or does not match ANNOTATION_SCHEMA
+SCHEMA_RETRIES = 2
+
+# Worker threads for reading parsed JSON/TXT files
+MAX_LOAD_WORKERS = 16
+
+# Batch API polling interval (seconds) for --batch runs
+BATCH_POLL_SECONDS = 60
+
+class RateLimiter:
+    """Token-bucket limiter for requests and tokens per minute."""
+    
+    def __init__(self, max_requests_per_minute: int, max_tokens_per_minute: int):
+        self.max_requests_per_minute = max_requests_per_minute
+        self.max_tokens_per_minute = max_tokens_per_minute
+        self.available_request_capacity = float(max_requests_per_minute)
+        self.available_token_capacity = float(max_tokens_per_minute)
+        self.last_update = time.monotonic()
+        self._lock = asyncio.Lock()
+    
+    def _refill(self):
+        """Add the capacity accrued since the last update, capped at the limits."""
+        now = time.monotonic()
+        elapsed = now - self.last_update
+        self.last_update = now
+        self.available_request_capacity = min(
+            self.max_requests_per_minute,
+            self.available_request_capacity + elapsed * self.max_requests_per_minute / 60
+        )
+        self.available_token_capacity = min(
+            self.max_tokens_per_minute,
+            self.available_token_capacity + elapsed * self.max_tokens_per_minute / 60
+        )
+    
+    async def acquire(self, estimated_tokens: int):
+        """Wait until one request and `estimated_tokens` tokens are available."""
+        estimated_tokens = min(estimated_tokens, self.max_tokens_per_minute)
+        async with self._lock:
+            while True:
+                self._refill()
+                if (self.available_request_capacity >= 1
+                        and self.available_token_capacity >= estimated_tokens):
+                    self.available_request_capacity -= 1
+                    self.available_token_capacity -= estimated_tokens
+                    return
+                await asyncio.sleep(0.1)
+
+_encoding = None
+
+def estimate_tokens(messages: list[dict], completion_tokens: int = COMPLETION_TOKENS_PER_PART) -> int:
+    """Estimate the tokens a request counts against TPM: every message plus the reply.
+    
+    Message content is counted with tiktoken, or ~4 chars/token without it.
+    """
+    global _encoding
+    if tiktoken is not None and _encoding is None:
+        try:
+            _encoding = tiktoken.encoding_for_model(MODEL)
+        except Exception:
+            _encoding = False
+    tokens = completion_tokens
+    for message in messages:
+        content = message["content"]
+        tokens += 4  # role and message framing
+        tokens += len(_encoding.encode(content)) if _encoding else len(content) // 4 + 1
+    return tokens
+
+_client = None
+_semaphore = None
+_limiter = None
+
+def get_client() -> openai.AsyncOpenAI:
+    """Return the shared AsyncOpenAI client, creating it on first use."""
+    global _client
+    if _client is None:
+        import httpx  # installed with openai
+        # One pooled client for the whole run, with enough keep-alive
+        # connections that concurrent requests don't redo TLS handshakes.
+        # SDK retries are off: create_completion's loop is the only retry policy
+        _client = openai.AsyncOpenAI(
+            max_retries=0,
+            http_client=openai.DefaultAsyncHttpxClient(
+                limits=httpx.Limits(
+                    max_connections=100,
+                    max_keepalive_connections=MAX_CONCURRENT_REQUESTS
+                )
+            )
+        )
+    return _client
+
+def get_limits() -> tuple[asyncio.Semaphore, RateLimiter]:
+    """Return the shared concurrency semaphore and rate limiter."""
+    global _semaphore, _limiter
+    if _semaphore is None:
+        _semaphore = asyncio.Semaphore(MAX_CONCURRENT_REQUESTS)
+        _limiter = RateLimiter(MAX_REQUESTS_PER_MINUTE, MAX_TOKENS_PER_MINUTE)
+    return _semaphore, _limiter
+
+def is_retryable(error: Exception) -> bool:
+    """Return True for rate limits, connection/timeout errors and 5xx responses."""
+    if isinstance(error, (openai.RateLimitError, openai.APIConnectionError, openai.APITimeoutError)):
+        return True
+    return isinstance(error, openai.APIStatusError) and error.status_code >= 500
+
+def retry_delay(error: Exception, attempt: int) -> float:
+    """Seconds to wait before the next attempt: retry-after if given, else jittered backoff."""
+    if isinstance(error, openai.RateLimitError):
+        try:
+            return float(error.response.headers["retry-after"])
+        except (AttributeError, KeyError, TypeError, ValueError):
+            pass
+    backoff = min(RETRY_MAX_WAIT, RETRY_MIN_WAIT * 2 ** attempt)
+    return max(RETRY_MIN_WAIT, random.uniform(0, backoff))
+
+def cache_path(prompt: str, system_prompt: str) -> Path:
+    """Cache file for a prompt, keyed by SHA-256 of model, system prompt and prompt.
+    
+    Whitespace is collapsed first so CRLF/trailing-space differences in the
+    TXT sources still hit. Near matches are deliberately not reused: prompts
+    for parts sharing material/thickness differ in part ID, which ends up in
+    the layer name and comments.
+    """
+    normalized = " ".join(f"{system_prompt}\0{prompt}".split())
+    key = hashlib.sha256(f"{MODEL}\0{normalized}".encode("utf-8")).hexdigest()
+    return CACHE_DIR / key[:2] / key[2:]
+
+def load_cached_response(path: Path):
+    """Return cached instructions if present and not expired, else None."""
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            entry = json.load(f)
+        if time.time() < entry["expires_at"]:
+            return entry["response"]
+    except (OSError, ValueError, KeyError, TypeError):
+        pass
+    return None
+
+def save_cached_response(path: Path, response: dict):
+    """Atomically write a response to the cache; failures are not fatal."""
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({"response": response, "expires_at": time.time() + CACHE_TTL_SECONDS}, f)
+        os.replace(tmp_path, path)
+    except OSError as e:
+        logger.warning("Could not write LLM cache entry %s: %s", path, e)
 
 def get_output_dir(subdirectory: str) -> Path:
     """Get the output directory based on the subdirectory (AutoCAD or Inventor)."""
@@ -27,7 +230,9 @@ def get_output_dir(subdirectory: str) -> Path:
     output_dir.mkdir(parents=True, exist_ok=True)
     return output_dir
 
-PROMPT_TEMPLATE = """
+# Static rules go in the system message so every request shares the same
+# prefix and benefits from OpenAI's automatic prompt caching (>= 1024 tokens).
+SYSTEM_PROMPT = """
 You are "DXF-Meta-Annotator", a tool that provides a JSON file carrying instructions to insert manufacturing metadata into DXF files compatible with CAM software.
 
 INPUTS YOU RECEIVE
@@ -84,21 +289,21 @@ MANDATORY STORAGE RULES
 OUTPUT FORMAT (JSON)
 Return a single object with keys:
 
-{{
+{
   "header_updates": [
-    {{"var": "$USERI1", "gcode": 70, "value": <int>, "placement": "before_endsec"|"update_existing"}},
-    {{"var": "$USERR1", "gcode": 40, "value": <float>, "placement": "before_endsec"|"update_existing"}}
+    {"var": "$USERI1", "gcode": 70, "value": <int>, "placement": "before_endsec"|"update_existing"},
+    {"var": "$USERR1", "gcode": 40, "value": <float>, "placement": "before_endsec"|"update_existing"}
   ],
   "layer_renames": [
-    {{"index": 0, "new": "MAT_<material>__THK_<thickness_mm>mm__PART_<part_id>", "placement": "inside_LAYER_record_0"}}
+    {"index": 0, "new": "MAT_<material>__THK_<thickness_mm>mm__PART_<part_id>", "placement": "inside_LAYER_record_0"}
   ],
   "add_comments": [
-    {{"comment": "Material: <material>, Thickness: <thickness_mm>mm, Part ID: <full_part_id>", "placement": "file_start"|"file_end"}}
+    {"comment": "Material: <material>, Thickness: <thickness_mm>mm, Part ID: <full_part_id>", "placement": "file_start"|"file_end"}
   ],
   "xdata_entries": [
-    {{"entity_handle": "<handle>", "app_id": "DXFMETA", "entries": [{{"gcode": 1000, "value": "PART_ID=<full_part_id>"}}], "placement": "append_to_entity"}}
+    {"entity_handle": "<handle>", "app_id": "DXFMETA", "entries": [{"gcode": 1000, "value": "PART_ID=<full_part_id>"}], "placement": "append_to_entity"}
   ]
-}}
+}
 
 Do not include extra keys, DXF snippets, or prose.
 
@@ -111,8 +316,10 @@ CONTEXT PRIORITY FOR METADATA VALUES
     • Thickness in mm (numeric value followed by "mm", "millimetre", etc.)
 
 RETURN ONLY THE JSON OBJECT
+"""
 
---- QIF METADATA ---
+# Per-part data, sent as the user message after the cached prefix
+USER_TEMPLATE = """--- QIF METADATA ---
 {qif_metadata}
 
 --- STEP METADATA ---
@@ -125,88 +332,360 @@ RETURN ONLY THE JSON OBJECT
 {cam}
 """
 
-def ask_llm(prompt: str) -> dict:
-    """Call the LLM API to get DXF annotation instructions."""
-    client = openai.OpenAI()
+# Same rules, but for several parts per request (--pack-size > 1)
+PACKED_SYSTEM_PROMPT = SYSTEM_PROMPT + """
+MULTIPLE PARTS
+The input is a JSON list of parts, each with part_name, qif_metadata, step_metadata
+and pdf_csv_text. Apply the rules above to every part independently. Return a single
+JSON object whose keys are the part_name values and whose values are that part's
+output object in the format above.
+"""
+
+PACKED_USER_TEMPLATE = """--- PARTS ---
+{parts_json}
+
+--- TARGET CAM SOFTWARE ---
+{cam}
+"""
+
+# Expected shape of the annotation instructions (the OUTPUT FORMAT in SYSTEM_PROMPT)
+ANNOTATION_SCHEMA = {
+    "type": "object",
+    "required": ["header_updates", "layer_renames", "add_comments", "xdata_entries"],
+    "additionalProperties": False,
+    "properties": {
+        "header_updates": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "required": ["var", "gcode", "value", "placement"],
+                "properties": {
+                    "var": {"type": "string"},
+                    "gcode": {"type": "integer", "enum": [40, 70]},
+                    "value": {"type": "number"},
+                    "placement": {"type": "string"}
+                }
+            }
+        },
+        "layer_renames": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "required": ["index", "new"],
+                "properties": {
+                    "index": {"type": "integer"},
+                    "new": {"type": "string"},
+                    "placement": {"type": "string"}
+                }
+            }
+        },
+        "add_comments": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "required": ["comment", "placement"],
+                "properties": {
+                    "comment": {"type": "string"},
+                    "placement": {"type": "string"}
+                }
+            }
+        },
+        "xdata_entries": {
+            "type": "array",
+            "items": {"type": "object"}
+        }
+    }
+}
+
+_JSON_TYPES = {
+    "object": dict,
+    "array": list,
+    "string": str,
+    "integer": int,
+    "number": (int, float),
+}
+
+def _check_schema(value, schema: dict, path: str = "data"):
+    """Minimal validator for the JSON Schema subset used by ANNOTATION_SCHEMA."""
+    expected = schema.get("type")
+    if expected and (not isinstance(value, _JSON_TYPES[expected]) or isinstance(value, bool)):
+        raise ValueError(f"{path} must be {expected}")
+    if "enum" in schema and value not in schema["enum"]:
+        raise ValueError(f"{path} must be one of {schema['enum']}")
+    if expected == "object":
+        for key in schema.get("required", []):
+            if key not in value:
+                raise ValueError(f"{path} must contain ['{key}'] property")
+        properties = schema.get("properties", {})
+        for key, item in value.items():
+            if key in properties:
+                _check_schema(item, properties[key], f"{path}.{key}")
+            elif schema.get("additionalProperties") is False:
+                raise ValueError(f"{path} must not contain '{key}' property")
+    elif expected == "array" and "items" in schema:
+        for i, item in enumerate(value):
+            _check_schema(item, schema["items"], f"{path}[{i}]")
+
+_compiled_schema = fastjsonschema.compile(ANNOTATION_SCHEMA) if fastjsonschema else None
+
+def validate_instructions(instructions) -> None:
+    """Raise ValueError if instructions don't match ANNOTATION_SCHEMA."""
+    if _compiled_schema is None:
+        _check_schema(instructions, ANNOTATION_SCHEMA)
+        return
+    try:
+        _compiled_schema(instructions)
+    except fastjsonschema.JsonSchemaException as e:
+        raise ValueError(e.message) from e
+
+def validate_packed_instructions(response, part_names: list) -> None:
+    """Raise ValueError unless a packed reply holds valid instructions for every part."""
+    if not isinstance(response, dict):
+        raise ValueError("data must be object")
+    for part_name in part_names:
+        if part_name not in response:
+            raise ValueError(f"data must contain ['{part_name}'] property")
+        try:
+            validate_instructions(response[part_name])
+        except ValueError as e:
+            raise ValueError(f"{part_name}: {e}") from e
+
+def build_messages(prompt: str, system_prompt: str = SYSTEM_PROMPT) -> list[dict]:
+    """Chat messages for an annotation prompt."""
+    return [
+        { "role": "system", "content": system_prompt },
+        { "role": "user", "content": prompt }
+    ]
+
+def completion_options(model: str) -> dict:
+    """Extra chat completion arguments for model: JSON mode where it is supported."""
+    if model.startswith(JSON_MODE_MODEL_PREFIXES):
+        return {"response_format": {"type": "json_object"}}
+    return {}
+
+def parse_llm_content(content: str) -> dict:
+    """Parse annotation instructions from a raw LLM reply."""
+    content = content.strip()
+    if not content:
+        raise ValueError("LLM returned empty response")
+    
+    # JSON mode returns a bare object
     try:
-        response = client.chat.completions.create(
-            model="gpt-4",
-            messages=[
-                { "role": "system", "content": "You are a DXF annotation expert." },
-                { "role": "user", "content": prompt }
-            ],
-            temperature=0.2,
-        )
-        content = response.choices[0].message.content.strip()
-        print(f"LLM Response: {content[:200]}...")  # Show first 200 chars
-        
-        if not content:
-            raise ValueError("LLM returned empty response")
-        
-        # Try to extract JSON from markdown code blocks if present
-        import re
-        json_match = re.search(r'```(?:json)?\s*(\{.*?\})\s*```', content, re.DOTALL)
-        if json_match:
-            json_content = json_match.group(1)
-            return json.loads(json_content)
-        
-        # If no code block, try to parse the entire content as JSON
         return json.loads(content)
+    except json.JSONDecodeError:
+        pass
+    
+    # Fall back to markdown code blocks for models without JSON mode (LLM_MODEL override)
+    json_match = JSON_FENCE_RE.search(content)
+    if json_match:
+        return json.loads(json_match.group(1))
+    return json.loads(content)
+
+async def create_completion(prompt: str, system_prompt: str,
+                            completion_tokens: int = COMPLETION_TOKENS_PER_PART) -> str:
+    """Send one chat completion, retrying transient API errors; returns the reply text."""
+    client = get_client()
+    semaphore, limiter = get_limits()
+    messages = build_messages(prompt, system_prompt)
+    estimated_tokens = estimate_tokens(messages, completion_tokens)
+    for attempt in range(MAX_ATTEMPTS):
+        try:
+            async with semaphore:
+                await limiter.acquire(estimated_tokens)
+                response = await client.chat.completions.create(
+                    model=MODEL,
+                    messages=messages,
+                    temperature=0.2,
+                    **completion_options(MODEL),
+                )
+            return response.choices[0].message.content
+        except Exception as e:
+            if attempt == MAX_ATTEMPTS - 1 or not is_retryable(e):
+                raise
+            # Sleep outside the semaphore so other parts keep making progress
+            delay = retry_delay(e, attempt)
+            logger.warning("%s, retrying in %.1fs (attempt %d/%d)", type(e).__name__, delay, attempt + 2, MAX_ATTEMPTS)
+            await asyncio.sleep(delay)
+
+async def ask_llm_async(prompt: str, system_prompt: str = SYSTEM_PROMPT,
+                        validator=validate_instructions,
+                        completion_tokens: int = COMPLETION_TOKENS_PER_PART) -> dict:
+    """Call the LLM API to get DXF annotation instructions.
+    
+    Replies that are not JSON or fail validator are re-asked up to
+    SCHEMA_RETRIES times with the validation error appended to the prompt.
+    completion_tokens is the expected reply size, charged to the rate limiter.
+    """
+    cached_path = cache_path(prompt, system_prompt)
+    cached = load_cached_response(cached_path)
+    if cached is not None:
+        logger.debug("LLM Response: (cache hit)")
+        return cached
+    
+    content = ""
+    request_prompt = prompt
+    try:
+        for attempt in range(SCHEMA_RETRIES + 1):
+            content = await create_completion(request_prompt, system_prompt, completion_tokens)
+            logger.debug("LLM Response: %s...", content[:200])  # Show first 200 chars
+            try:
+                instructions = parse_llm_content(content)
+                validator(instructions)
+                break
+            except ValueError as e:  # Includes json.JSONDecodeError
+                if attempt == SCHEMA_RETRIES:
+                    raise
+                logger.warning("Invalid LLM response (%s), asking again", e)
+                request_prompt = (
+                    f"{prompt}\n--- PREVIOUS REPLY WAS INVALID ---\n{e}\n"
+                    "Return only a JSON object that follows the OUTPUT FORMAT exactly.\n"
+                )
+        save_cached_response(cached_path, instructions)
+        return instructions
         
     except json.JSONDecodeError as e:
-        print(f"JSON Decode Error: {e}")
-        print(f"Full LLM response: {content}")
+        logger.error("JSON Decode Error: %s", e)
+        logger.debug("Full LLM response: %s", content)
         raise
     except Exception as e:
-        print(f"LLM API Error: {e}")
+        logger.error("LLM API Error: %s", e)
         raise
 
+async def run_batch(prompts: dict) -> dict:
+    """Submit prompts through the OpenAI Batch API and wait for the results.
+    
+    Returns {part_name: instructions}, or the exception for parts whose
+    request failed. Successful results are written to the response cache.
+    """
+    client = get_client()
+    lines = [
+        json.dumps({
+            "custom_id": part_name,
+            "method": "POST",
+            "url": "/v1/chat/completions",
+            "body": {
+                "model": MODEL,
+                "messages": build_messages(prompt),
+                "temperature": 0.2,
+                **completion_options(MODEL)
+            }
+        }, ensure_ascii=False)
+        for part_name, prompt in prompts.items()
+    ]
+    batch_input = await client.files.create(
+        file=("batch_input.jsonl", "\n".join(lines).encode("utf-8")),
+        purpose="batch"
+    )
+    batch = await client.batches.create(
+        input_file_id=batch_input.id,
+        endpoint="/v1/chat/completions",
+        completion_window="24h"
+    )
+    logger.info("📦 Submitted batch %s with %d requests", batch.id, len(prompts))
+    
+    while batch.status not in ("completed", "failed", "expired", "cancelled"):
+        await asyncio.sleep(BATCH_POLL_SECONDS)
+        batch = await client.batches.retrieve(batch.id)
+        logger.info("Batch %s: %s", batch.id, batch.status)
+    
+    if batch.status != "completed":
+        raise RuntimeError(f"Batch {batch.id} ended with status '{batch.status}'")
+    
+    outputs = {}
+    for file_id in (batch.output_file_id, batch.error_file_id):
+        if not file_id:
+            continue
+        content = await client.files.content(file_id)
+        for line in content.text.splitlines():
+            if not line.strip():
+                continue
+            entry = json.loads(line)
+            part_name = entry["custom_id"]
+            try:
+                response = entry.get("response") or {}
+                if entry.get("error") or response.get("status_code") != 200:
+                    raise RuntimeError(f"Batch request failed: {entry.get('error') or response.get('body')}")
+                instructions = parse_llm_content(response["body"]["choices"][0]["message"]["content"])
+                validate_instructions(instructions)
+                save_cached_response(cache_path(prompts[part_name], SYSTEM_PROMPT), instructions)
+                outputs[part_name] = instructions
+            except Exception as e:
+                outputs[part_name] = e
+    
+    for part_name in prompts:
+        outputs.setdefault(part_name, RuntimeError("No batch output returned for this part"))
+    return outputs
+
+def read_json_file(path: str):
+    """Read and parse one JSON file (orjson when available)."""
+    with open(path, 'rb') as f:
+        raw = f.read()
+    return orjson.loads(raw) if orjson else json.loads(raw)
+
+def dump_json(obj, indent: bool = True) -> bytes:
+    """Serialize to UTF-8 JSON bytes (orjson when available)."""
+    if orjson:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2 if indent else 0)
+    return json.dumps(obj, indent=2 if indent else None, ensure_ascii=False).encode("utf-8")
+
+def read_txt_file(path: str) -> str:
+    """Read one UTF-8 text file."""
+    with open(path, 'r', encoding='utf-8') as f:
+        return f.read()
+
+def load_files_parallel(paths: dict, reader, label: str) -> dict:
+    """Read {part_name: path} concurrently with reader; failed files are reported and skipped."""
+    loaded = {}
+    if not paths:
+        return loaded
+    with ThreadPoolExecutor(max_workers=min(MAX_LOAD_WORKERS, len(paths))) as executor:
+        futures = {part_name: executor.submit(reader, path) for part_name, path in paths.items()}
+        for part_name, future in futures.items():
+            try:
+                loaded[part_name] = future.result()
+                logger.debug("Loaded %s data for %s", label, part_name)
+            except Exception as e:
+                logger.error("❌ Error loading %s %s: %s", label, paths[part_name], e)
+    return loaded
+
 def load_parsed_data(subdirectory: str) -> dict:
     """Load all parsed data for a subdirectory."""
     data_dir = PARSED_RESULTS_DIR / subdirectory
     
     if not data_dir.exists():
-        print(f"❌ Parsed results directory not found: {data_dir}")
+        logger.error("❌ Parsed results directory not found: %s", data_dir)
         return {}
     
-    all_data = {}
-    
-    # Load all JSON files (excluding DXF and summary files)
-    for json_file in data_dir.glob("*.json"):
-        part_name = json_file.stem
-        
-        # Skip summary and DXF files (we'll handle DXF separately)
-        if part_name.endswith("_summary") or part_name.endswith("_dxf"):
-            continue
+    # Collect all JSON files (excluding DXF and summary files)
+    json_paths = {}
+    with os.scandir(data_dir) as entries:
+        for entry in entries:
+            if not entry.name.endswith(".json"):
+                continue
+            part_name = entry.name[:-len(".json")]
             
-        try:
-            with open(json_file, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-                all_data[part_name] = data
-                print(f"✅ Loaded JSON data for {part_name}")
-        except Exception as e:
-            print(f"❌ Error loading {json_file}: {e}")
+            # Skip summary and DXF files (we'll handle DXF separately)
+            if part_name.endswith("_summary") or part_name.endswith("_dxf"):
+                continue
+            json_paths[part_name] = entry.path
     
-    return all_data
+    return load_files_parallel(json_paths, read_json_file, "JSON")
 
 def load_txt_data(subdirectory: str) -> dict:
     """Load TXT files for additional context."""
     data_dir = PARSED_RESULTS_DIR / subdirectory
-    txt_data = {}
     
-    # Load TXT files
-    for txt_file in data_dir.glob("*.txt"):
-        part_name = txt_file.stem
-        
-        try:
-            with open(txt_file, 'r', encoding='utf-8') as f:
-                content = f.read()
-                txt_data[part_name] = content
-                print(f"✅ Loaded TXT data for {part_name}")
-        except Exception as e:
-            print(f"❌ Error loading TXT {txt_file}: {e}")
+    if not data_dir.exists():
+        return {}
+    
+    # Collect TXT files
+    txt_paths = {}
+    with os.scandir(data_dir) as entries:
+        for entry in entries:
+            if entry.name.endswith(".txt"):
+                txt_paths[entry.name[:-len(".txt")]] = entry.path
     
-    return txt_data
+    return load_files_parallel(txt_paths, read_txt_file, "TXT")
 
 def validate_metadata_consistency(part_name: str, part_data: dict) -> tuple[bool, dict, str]:
     """
@@ -253,10 +732,8 @@ def validate_metadata_consistency(part_name: str, part_data: dict) -> tuple[bool
         # Convert to string and extract numeric value
         thickness_str = str(thickness_value).lower()
         
-        # Remove common units and extract number
-        import re
-        # Match numbers with optional decimal places, followed by optional units
-        match = re.search(r'(\d+\.?\d*)', thickness_str)
+        # Match numbers with optional decimal places, ignoring units
+        match = THICKNESS_RE.search(thickness_str)
         if match:
             return float(match.group(1))
         return None
@@ -318,10 +795,11 @@ def validate_metadata_consistency(part_name: str, part_data: dict) -> tuple[bool
     
     return is_consistent, unified_metadata, error_message
 
-def process_part(part_name: str, part_data: dict, txt_data: dict) -> dict:
-    """Process a single part and generate LLM response with DXF structure."""
-    print(f"\nProcessing part: {part_name}")
-    
+def prepare_part(part_name: str, part_data: dict, txt_data: dict) -> tuple:
+    """
+    Validate a part and collect the values that go into its prompt.
+    Returns: (prompt_fields, unified_metadata, error_result); prompt_fields is None if validation failed
+    """
     # Validate metadata consistency
     is_consistent, unified_metadata, error_message = validate_metadata_consistency(part_name, part_data)
     
@@ -332,8 +810,8 @@ def process_part(part_name: str, part_data: dict, txt_data: dict) -> dict:
             "unified_metadata": unified_metadata,
             "validation_errors": unified_metadata.get("validation_errors", [])
         }
-        print(f"❌ Metadata inconsistency for {part_name}: {error_message}")
-        return error_result
+        logger.warning("❌ Metadata inconsistency for %s: %s", part_name, error_message)
+        return None, unified_metadata, error_result
     
     # Extract data from different sources
     pdf_csv_text = ""
@@ -352,41 +830,180 @@ def process_part(part_name: str, part_data: dict, txt_data: dict) -> dict:
     
     # Prepare data for LLM
     unified_json = json.dumps(unified_metadata, indent=2)
+    prompt_fields = {
+        "qif_metadata": unified_json,
+        "step_metadata": unified_json,
+        "pdf_csv_text": pdf_csv_text if pdf_csv_text else "No PDF/CSV text available"
+    }
+    return prompt_fields, unified_metadata, None
+
+def build_part_prompt(part_name: str, part_data: dict, txt_data: dict) -> tuple:
+    """
+    Validate a part and build its LLM prompt.
+    Returns: (prompt, unified_metadata, error_result); prompt is None if validation failed
+    """
+    prompt_fields, unified_metadata, error_result = prepare_part(part_name, part_data, txt_data)
+    if prompt_fields is None:
+        return None, unified_metadata, error_result
     
     # Create prompt for DXF annotation
-    prompt = PROMPT_TEMPLATE.format(
-        qif_metadata=unified_json,
-        step_metadata=unified_json,
-        pdf_csv_text=pdf_csv_text if pdf_csv_text else "No PDF/CSV text available",
-        cam=CAM
+    prompt = USER_TEMPLATE.format(**prompt_fields, cam=CAM)
+    return prompt, unified_metadata, None
+
+def build_packed_prompt(parts: dict) -> str:
+    """Build one prompt covering several parts ({part_name: prompt_fields})."""
+    parts_json = json.dumps(
+        [{"part_name": part_name, **prompt_fields} for part_name, prompt_fields in parts.items()],
+        indent=2, ensure_ascii=False
     )
-    
-    # Call LLM to get annotation instructions
-    try:
-        annotation_instructions = ask_llm(prompt)
-        
-        # Add metadata to result
-        result = {
-            "part_name": part_name,
-            "unified_metadata": unified_metadata,
-            "validation_status": "consistent",
-            "annotation_instructions": annotation_instructions
-        }
-        
-        return result
-    except Exception as e:
-        print(f"❌ Error processing {part_name}: {e}")
+    return PACKED_USER_TEMPLATE.format(parts_json=parts_json, cam=CAM)
+
+def make_part_result(part_name: str, unified_metadata: dict, annotation_instructions) -> dict:
+    """Build the saved result for a part from its instructions or the exception raised."""
+    if isinstance(annotation_instructions, Exception):
+        logger.error("❌ Error processing %s: %s", part_name, annotation_instructions)
         return {
-            "error": str(e),
+            "error": str(annotation_instructions),
             "part_name": part_name,
             "unified_metadata": unified_metadata,
-            "validation_status": "consistent" if is_consistent else "inconsistent"
+            "validation_status": "consistent"
         }
+    return {
+        "part_name": part_name,
+        "unified_metadata": unified_metadata,
+        "validation_status": "consistent",
+        "annotation_instructions": annotation_instructions
+    }
+
+def render_instructions_direct(unified_metadata: dict) -> dict:
+    """Build annotation instructions locally from complete unified metadata.
+    
+    Follows the MANDATORY STORAGE RULES in SYSTEM_PROMPT; xdata_entries stay
+    empty because entity handles are not known without the DXF.
+    """
+    material = str(unified_metadata["material"])
+    part_id = str(unified_metadata["part_id"])
+    thickness = float(THICKNESS_RE.search(str(unified_metadata["thickness"])).group(1))
+    digits = DIGITS_RE.search(part_id)
+    comment = f"Material: {material}, Thickness: {thickness}mm, Part ID: {part_id}"
+    return {
+        "header_updates": [
+            {"var": "$USERI1", "gcode": 70, "value": int(digits.group()) if digits else 0, "placement": "before_endsec"},
+            {"var": "$USERR1", "gcode": 40, "value": thickness, "placement": "before_endsec"}
+        ],
+        "layer_renames": [
+            {"index": 0, "new": f"MAT_{material}__THK_{thickness}mm__PART_{part_id}", "placement": "inside_LAYER_record_0"}
+        ],
+        "add_comments": [
+            {"comment": comment, "placement": "file_start"},
+            {"comment": comment, "placement": "file_end"}
+        ],
+        "xdata_entries": []
+    }
+
+def render_part_direct(part_name: str, part_data: dict):
+    """Return a result without calling the LLM if material, thickness and part ID are all known, else None."""
+    is_consistent, unified_metadata, _ = validate_metadata_consistency(part_name, part_data)
+    if not is_consistent:
+        return None
+    if any(unified_metadata.get(key) in (None, "", "N/A") for key in ("material", "thickness", "part_id")):
+        return None
+    if not THICKNESS_RE.search(str(unified_metadata["thickness"])):
+        return None
+    result = make_part_result(part_name, unified_metadata, render_instructions_direct(unified_metadata))
+    result["llm_skipped"] = True
+    return result
+
+async def process_part_async(part_name: str, part_data: dict, txt_data: dict) -> dict:
+    """Process a single part and generate LLM response with DXF structure."""
+    logger.debug("Processing part: %s", part_name)
+    
+    prompt, unified_metadata, error_result = build_part_prompt(part_name, part_data, txt_data)
+    if prompt is None:
+        return error_result
+    
+    # Call LLM to get annotation instructions
+    try:
+        annotation_instructions = await ask_llm_async(prompt)
+    except Exception as e:
+        annotation_instructions = e
+    return make_part_result(part_name, unified_metadata, annotation_instructions)
+
+async def process_parts_packed(parsed_data: dict, txt_data: dict, pack_size: int) -> list:
+    """Process parts pack_size at a time, one LLM request per pack."""
+    prepared = {
+        part_name: prepare_part(part_name, part_data, txt_data)
+        for part_name, part_data in parsed_data.items()
+    }
+    valid = [part_name for part_name, (prompt_fields, _, _) in prepared.items() if prompt_fields is not None]
+    packs = [valid[i:i + pack_size] for i in range(0, len(valid), pack_size)]
+    
+    async def ask_pack(pack: list) -> dict:
+        prompt = build_packed_prompt({part_name: prepared[part_name][0] for part_name in pack})
+        try:
+            response = await ask_llm_async(
+                prompt, PACKED_SYSTEM_PROMPT,
+                validator=lambda reply: validate_packed_instructions(reply, pack),
+                completion_tokens=COMPLETION_TOKENS_PER_PART * len(pack)
+            )
+        except Exception as e:
+            return {part_name: e for part_name in pack}
+        return {part_name: response[part_name] for part_name in pack}
+    
+    logger.info("Sending %d parts in %d packed requests...", len(valid), len(packs))
+    instructions = {}
+    for pack_result in await asyncio.gather(*(ask_pack(pack) for pack in packs)):
+        instructions.update(pack_result)
+    
+    results = []
+    for part_name, (prompt_fields, unified_metadata, error_result) in prepared.items():
+        if prompt_fields is None:
+            results.append(error_result)
+        else:
+            results.append(make_part_result(part_name, unified_metadata, instructions[part_name]))
+    return results
+
+async def process_parts_batch(parsed_data: dict, txt_data: dict) -> list:
+    """Process all parts through one Batch API job; cached parts are not resubmitted."""
+    prepared = {
+        part_name: build_part_prompt(part_name, part_data, txt_data)
+        for part_name, part_data in parsed_data.items()
+    }
+    
+    instructions = {}
+    pending = {}
+    for part_name, (prompt, _, _) in prepared.items():
+        if prompt is None:
+            continue
+        cached = load_cached_response(cache_path(prompt, SYSTEM_PROMPT))
+        if cached is not None:
+            instructions[part_name] = cached
+        else:
+            pending[part_name] = prompt
+    
+    if pending:
+        logger.info("%d parts cached, submitting %d to the Batch API...", len(instructions), len(pending))
+        try:
+            instructions.update(await run_batch(pending))
+        except Exception as e:
+            logger.error("❌ Batch failed: %s", e)
+            instructions.update({part_name: e for part_name in pending})
+    
+    results = []
+    for part_name, (prompt, unified_metadata, error_result) in prepared.items():
+        if prompt is None:
+            results.append(error_result)
+        else:
+            results.append(make_part_result(part_name, unified_metadata, instructions[part_name]))
+    return results
 
-def main():
-    """Main function to process all parts."""
-    print("🚀 COMBINED LLM - Processing all parsed data")
-    print("=" * 60)
+async def main(batch: bool = False, pack_size: int = 1, direct: bool = True):
+    """
+    Main function to process all parts.
+    batch=True goes through the Batch API; pack_size > 1 sends that many parts per request.
+    direct=True renders parts with complete metadata locally instead of asking the LLM.
+    """
+    logger.info("🚀 COMBINED LLM - Processing all parsed data")
     
     # Process both AutoCAD and Inventor subdirectories
     subdirectories = ["AutoCAD", "Inventor"]
@@ -394,74 +1011,112 @@ def main():
     all_success = True
     
     for subdirectory in subdirectories:
-        print(f"\n{'='*40}")
-        print(f"Processing subdirectory: {subdirectory}")
-        print(f"{'='*40}")
+        logger.info("Processing subdirectory: %s", subdirectory)
         
         # Load all parsed data
-        print(f"\nLoading parsed data from: {PARSED_RESULTS_DIR / subdirectory}")
+        logger.debug("Loading parsed data from: %s", PARSED_RESULTS_DIR / subdirectory)
         parsed_data = load_parsed_data(subdirectory)
         
         if not parsed_data:
-            print(f"❌ No parsed data found for {subdirectory}!")
+            logger.error("❌ No parsed data found for %s!", subdirectory)
             all_success = False
             continue
         
         # Load TXT data
-        print(f"\nLoading TXT data for {subdirectory}...")
+        logger.debug("Loading TXT data for %s...", subdirectory)
         txt_data = load_txt_data(subdirectory)
         
-        # Process each part
-        print(f"\nProcessing {len(parsed_data)} parts for {subdirectory}...")
+        # Process all parts concurrently
+        logger.info("Processing %d parts for %s...", len(parsed_data), subdirectory)
         results = {}
         
-        for part_name, part_data in parsed_data.items():
-            try:
-                result = process_part(part_name, part_data, txt_data)
-                results[part_name] = result
-                
-                # Save individual result
-                output_path = LLM_RESULTS_DIR / subdirectory.lower() / f"{part_name}_llm_response.json"
-                output_path.parent.mkdir(parents=True, exist_ok=True)
-                with open(output_path, 'w', encoding='utf-8') as f:
-                    json.dump(result, f, indent=2, ensure_ascii=False)
-                print(f"✅ Saved LLM response: {output_path.name}")
-                
-            except Exception as e:
-                print(f"❌ Error processing {part_name}: {e}")
-                results[part_name] = {"error": str(e)}
+        # Parts whose instructions are a pure function of their metadata skip the LLM
+        results_by_part = {}
+        if direct:
+            for part_name, part_data in parsed_data.items():
+                direct_result = render_part_direct(part_name, part_data)
+                if direct_result is not None:
+                    results_by_part[part_name] = direct_result
+            if results_by_part:
+                logger.info("Rendered %d parts with complete metadata without the LLM", len(results_by_part))
+        llm_parts = {name: data for name, data in parsed_data.items() if name not in results_by_part}
+        
+        if not llm_parts:
+            results_list = []
+        elif batch:
+            results_list = await process_parts_batch(llm_parts, txt_data)
+        elif pack_size > 1:
+            results_list = await process_parts_packed(llm_parts, txt_data, pack_size)
+        else:
+            tasks = [process_part_async(name, data, txt_data) for name, data in llm_parts.items()]
+            results_list = await asyncio.gather(*tasks, return_exceptions=True)
+        results_by_part.update(zip(llm_parts, results_list))
         
-        # Save combined results for this subdirectory
-        combined_output_path = LLM_RESULTS_DIR / subdirectory.lower() / f"{subdirectory.lower()}_all_llm_responses.json"
-        combined_output_path.parent.mkdir(parents=True, exist_ok=True)
-        with open(combined_output_path, 'w', encoding='utf-8') as f:
-            json.dump(results, f, indent=2, ensure_ascii=False)
+        # Output directory is the same for every part, so create it once
+        subdir_out = LLM_RESULTS_DIR / subdirectory.lower()
+        subdir_out.mkdir(parents=True, exist_ok=True)
+        
+        # Combined results for this subdirectory, one {part_name: result} object per line
+        combined_output_path = subdir_out / f"{subdirectory.lower()}_all_llm_responses.jsonl"
+        with open(combined_output_path, 'wb') as combined_file:
+            for part_name in parsed_data:
+                result = results_by_part[part_name]
+                try:
+                    if isinstance(result, BaseException):
+                        raise result
+                    results[part_name] = result
+                    
+                    # Save individual result
+                    output_path = subdir_out / f"{part_name}_llm_response.json"
+                    with open(output_path, 'wb') as f:
+                        f.write(dump_json(result))
+                    logger.debug("Saved LLM response: %s", output_path.name)
+                    
+                except Exception as e:
+                    logger.error("❌ Error processing %s: %s", part_name, e)
+                    results[part_name] = {"error": str(e)}
+                
+                combined_file.write(dump_json({part_name: results[part_name]}, indent=False) + b"\n")
         
         # Print summary for this subdirectory
         success_count = sum(1 for r in results.values() if "error" not in r)
         error_count = len(results) - success_count
         
-        print(f"\n{'='*40}")
-        print(f"🎯 {subdirectory.upper()} COMPLETED")
-        print(f"{'='*40}")
-        print(f"Parts processed: {len(results)}")
-        print(f"Successful: {success_count}")
-        print(f"Errors: {error_count}")
-        print(f"Output location: {LLM_RESULTS_DIR / subdirectory.lower()}")
-        print(f"Combined results: {combined_output_path.name}")
+        logger.info("🎯 %s COMPLETED", subdirectory.upper())
+        logger.info("Parts processed: %d", len(results))
+        logger.info("Successful: %d", success_count)
+        logger.info("Errors: %d", error_count)
+        logger.info("Output location: %s", subdir_out)
+        logger.info("Combined results: %s", combined_output_path.name)
         
         if error_count > 0:
             all_success = False
     
     # Print overall summary
-    print(f"\n{'='*60}")
-    print("🎯 OVERALL COMBINED LLM COMPLETED")
-    print(f"{'='*60}")
-    print(f"Subdirectories processed: {', '.join(subdirectories)}")
-    print(f"Output location: {LLM_RESULTS_DIR}")
+    logger.info("🎯 OVERALL COMBINED LLM COMPLETED")
+    logger.info("Subdirectories processed: %s", ', '.join(subdirectories))
+    logger.info("Output location: %s", LLM_RESULTS_DIR)
+    
+    if _client is not None:
+        await _client.close()
     
     return all_success
 
 if __name__ == "__main__":
-    success = main()
+    parser = argparse.ArgumentParser(description="Generate DXF annotation instructions with an LLM")
+    parser.add_argument("--batch", action="store_true",
+                        help="Submit all parts through the OpenAI Batch API (50%% cheaper, up to 24h turnaround)")
+    parser.add_argument("--pack-size", type=int, default=1,
+                        help="Number of parts to send per request (default: 1, no packing)")
+    parser.add_argument("--always-llm", action="store_true",
+                        help="Ask the LLM even for parts whose material, thickness and part ID are all known")
+    parser.add_argument("--verbose", action="store_true",
+                        help="Log per-part details (DEBUG level)")
+    args = parser.parse_args()
+    if args.pack_size < 1:
+        parser.error("--pack-size must be at least 1")
+    if args.batch and args.pack_size > 1:
+        parser.error("--pack-size cannot be combined with --batch")
+    logging.basicConfig(level=logging.DEBUG if args.verbose else logging.INFO, format="%(message)s")
+    success = asyncio.run(main(batch=args.batch, pack_size=args.pack_size, direct=not args.always_llm))
     sys.exit(0 if success else 1) 
\ No newline at end of file
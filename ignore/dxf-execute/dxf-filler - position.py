@@ -1,12 +1,27 @@
 """Apply LLM-generated patches to DXF files."""
 from __future__ import annotations
 
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 from typing import Dict, List, Union
+import argparse
 import json
-import ezdxf
+import logging
+import os
 import sys
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+from ezdxf.lldxf.tagger import ascii_tags_loader
+
+logger = logging.getLogger(__name__)
+
+# Characters not allowed in layer names, replaced with "_"
+_LAYER_BAD_CHARS = str.maketrans({c: "_" for c in '<>/\\":;?*|='})
+
 
 def _load_lines(path: Union[str, Path]) -> List[str]:
     """Load DXF file as list of lines."""
@@ -15,71 +30,76 @@ def _load_lines(path: Union[str, Path]) -> List[str]:
     return path.read_text(encoding="utf-8", errors="ignore").splitlines()
 
 
-def _section(lines: List[str], name: str) -> tuple[int, int]:
-    """Find start and end indices of a DXF section."""
-    name = name.upper()
-    start = -1
-    end = -1
+class _LineReader:
+    """Minimal readline() view over a list of lines, for ezdxf's tag loader.
     
-    print(f"\nSearching for {name} section...")
-    for i in range(len(lines) - 3):
-        # Strip spaces from group codes
-        if (
-            lines[i].strip() == "0"
-            and lines[i + 1].strip().upper() == "SECTION"
-            and lines[i + 2].strip() == "2"
-            and lines[i + 3].strip().upper() == name
-        ):
-            start = i + 4
-            print(f"Found {name} section start at {start}")
-            for j in range(start, len(lines) - 1):
-                if lines[j].strip() == "0" and lines[j + 1].strip().upper() == "ENDSEC":
-                    end = j
-                    print(f"Found {name} section end at {end}")
-                    return start, end
-            break
+    Avoids joining the lines into one string just to tokenize them, and keeps
+    the tag-to-line mapping exact (one list item per readline call).
+    """
     
-    if start == -1:
-        print(f"WARNING: Could not find {name} section!")
-        print("First few lines of file:")
-        for i in range(min(10, len(lines))):
-            print(f"{i}: {lines[i]}")
+    def __init__(self, lines: List[str]):
+        self._lines = iter(lines)
     
-    return start, end
-
+    def readline(self) -> str:
+        line = next(self._lines, None)
+        return "" if line is None else line + "\n"
 
-def _find_header_var(lines: List[str], var_name: str) -> int:
-    """Find the index of a header variable, or -1 if not found."""
-    for i in range(len(lines) - 3):
-        if (
-            lines[i].strip() == "9"
-            and lines[i + 1].strip() == var_name
-            and i + 3 < len(lines)
-        ):
-            print(f"Found header var {var_name} at index {i}")
-            return i
-    print(f"Header var {var_name} not found")
-    return -1
 
-
-def _find_layer_by_index(lines: List[str], index: int) -> tuple[int, int]:
-    """Find the start and end indices of a layer by its position in the LAYER table.
+def _index_dxf(lines: List[str]) -> Dict:
+    """Index sections, header variables and LAYER records in a single pass.
+    
+    The lines are tokenized into (group code, value) tags by ezdxf's ASCII tag
+    loader, so padded and unpadded group codes are handled alike. Every tag
+    spans two lines: tag k has its group code at line 2k and value at 2k + 1.
     
     Returns:
-        tuple of (start_index, name_index) where:
-        - start_index is the start of the LAYER record (0\nLAYER)
-        - name_index is the position of the layer name (2\nNAME)
+        dict with:
+        - "sections": {NAME: (start, end)} where start is the first line after
+          the section name and end is the "0" line before ENDSEC (-1 if missing)
+        - "header_vars": {var_name: index of its "9" group code line}
+        - "layers": list of (start_index, name_index) per LAYER record, in
+          table order; name_index is the "2" group code line (-1 if missing)
+    
+    Raises:
+        DXFStructureError: a group code line is not an integer
     """
-    current_index = -1
-    for i in range(len(lines) - 1):
-        if lines[i] == "0" and lines[i + 1].upper() == "LAYER":
-            current_index += 1
-            if current_index == index:
-                # Found the layer, now find its name
-                for j in range(i, min(i + 20, len(lines) - 1)):
-                    if lines[j] == "2":  # Group code for layer name
-                        return i, j
-    return -1, -1
+    sections: Dict[str, tuple[int, int]] = {}
+    header_vars: Dict[str, int] = {}
+    layers: List[tuple[int, int]] = []
+    current = None  # Name of the section being scanned
+    section_pending = False  # Previous tag was (0, SECTION)
+    layer_pending = False  # Inside a LAYER record whose name is not yet seen
+    
+    tags = ascii_tags_loader(_LineReader(lines), skip_comments=False)
+    for k, (code, value) in enumerate(tags):
+        i = 2 * k
+        if section_pending:
+            section_pending = False
+            name = value.strip().upper()
+            if code == 2 and name not in sections:
+                current = name
+                sections[name] = (i + 2, -1)
+                continue
+        if code == 0:
+            layer_pending = False
+            value = value.strip().upper()
+            if value == "SECTION":
+                section_pending = True
+            elif value == "ENDSEC" and current is not None:
+                sections[current] = (sections[current][0], i)
+                current = None
+            elif value == "LAYER" and current == "TABLES":
+                layers.append((i, -1))
+                layer_pending = True
+        elif code == 2 and layer_pending:
+            layers[-1] = (layers[-1][0], i)
+            layer_pending = False
+        elif code == 9 and current == "HEADER":
+            header_vars.setdefault(value.strip(), i)
+    
+    for name, (start, end) in sections.items():
+        logger.debug("Found %s section: %d to %d", name, start, end)
+    return {"sections": sections, "header_vars": header_vars, "layers": layers}
 
 
 def apply_patch(dxf_path: Union[str, Path], patch: Dict) -> List[str]:
@@ -92,14 +112,28 @@ def apply_patch(dxf_path: Union[str, Path], patch: Dict) -> List[str]:
     Returns:
         Modified DXF as list of lines
     """
-    # Load DXF
-    lines = _load_lines(dxf_path)
-    print(f"\nLoaded DXF file with {len(lines)} lines")
-    modified = lines.copy()
+    # Load DXF; the freshly loaded list is edited in place, never copied
+    modified = _load_lines(dxf_path)
+    logger.debug("Loaded DXF file with %d lines", len(modified))
+    
+    # All positions below refer to the original lines. In-place edits are
+    # applied directly; insertions are collected and spliced in at the end.
+    index = _index_dxf(modified)
+    sections = index["sections"]
+    inserts: Dict[int, List[str]] = {}
+    
+    def _comment_lines(comment: str) -> List[str]:
+        block = []
+        for line in [comment[i:i+256] for i in range(0, len(comment), 256)]:
+            block.append("999")
+            block.append(line.strip())  # Remove any newlines
+        return block
     
     # 1. Apply header updates
     if "header_updates" in patch:
-        header_start, header_end = _section(modified, "HEADER")
+        header_start, header_end = sections.get("HEADER", (-1, -1))
+        if header_start < 0:
+            logger.warning("Could not find HEADER section in %s", dxf_path)
         if header_start >= 0 and header_end >= 0:
             for update in patch["header_updates"]:
                 var_name = update["var"]
@@ -107,53 +141,35 @@ def apply_patch(dxf_path: Union[str, Path], patch: Dict) -> List[str]:
                 value = update["value"]
                 placement = update.get("placement", "before_endsec")
                 
-                print(f"Processing header update: {var_name} = {value} (placement: {placement})")
+                logger.debug("Processing header update: %s = %s (placement: %s)", var_name, value, placement)
                 
                 # Only allow $USERI1-5 (int, 70) and $USERR1-5 (float, 40)
                 if not (var_name.startswith("$USERI") or var_name.startswith("$USERR")):
-                    print(f"  Skipping {var_name} - not a valid user variable")
+                    logger.debug("  Skipping %s - not a valid user variable", var_name)
                     continue
                 if gcode not in (40, 70):
-                    print(f"  Skipping {var_name} - invalid group code {gcode}")
+                    logger.debug("  Skipping %s - invalid group code %s", var_name, gcode)
                     continue
                 
-                # Search for the variable
-                var_idx = _find_header_var(modified[header_start:header_end], var_name)
+                # Look up the variable
+                var_idx = index["header_vars"].get(var_name, -1)
                 
                 if placement == "before_endsec":
                     # Always add new variable before ENDSEC, regardless of whether it exists
-                    print(f"  Adding new variable {var_name} = {value} before ENDSEC")
-                    print(f"  Header section: {header_start} to {header_end}")
-                    
-                    # Find ENDSEC line in header section
-                    endsec_idx = -1
-                    for i in range(header_start, header_end + 1):
-                        if modified[i].strip() == "0" and modified[i + 1].strip().upper() == "ENDSEC":
-                            endsec_idx = i + 1  # Point to the ENDSEC line itself
-                            print(f"  Found ENDSEC at index {i + 1}")
-                            break
-                    
-                    if endsec_idx >= 0:
-                        # Insert new variable before ENDSEC
-                        # Format group codes with proper padding (right-aligned)
-                        modified.insert(endsec_idx, str(value))  # Value
-                        modified.insert(endsec_idx, f" {gcode:>3}")   # Group code (right-aligned, 3 chars wide)
-                        modified.insert(endsec_idx, var_name)     # Variable name
-                        modified.insert(endsec_idx, "  9")          # Group code for variable (padded)
-                        print(f"  Inserted {var_name} at index {endsec_idx}")
-                    else:
-                        print(f"  Warning: Could not find ENDSEC in header section")
-                        print(f"  Header section lines:")
-                        for i in range(header_start, min(header_start + 10, header_end)):
-                            print(f"    {i}: {modified[i]}")
-                        if header_end - header_start > 10:
-                            print(f"    ... and {header_end - header_start - 10} more lines")
+                    # (header_end is the "0" line that precedes ENDSEC)
+                    logger.debug("  Adding new variable %s = %s before ENDSEC at index %d", var_name, value, header_end)
+                    # Format group codes with proper padding (right-aligned)
+                    inserts.setdefault(header_end, []).extend([
+                        "  9",              # Group code for variable (padded)
+                        var_name,           # Variable name
+                        f" {gcode:>3}",     # Group code (right-aligned, 3 chars wide)
+                        str(value),         # Value
+                    ])
                         
                 elif placement == "update_existing":
                     # Only update if variable exists, otherwise skip
                     if var_idx >= 0:
-                        var_idx += header_start
-                        print(f"  Updating existing variable {var_name} at index {var_idx + 3}")
+                        logger.debug("  Updating existing variable %s at index %d", var_name, var_idx + 3)
                         # Format the value properly based on group code
                         if gcode == 70:  # Integer
                             modified[var_idx + 3] = f"{int(value):>6}"  # Right-aligned, 6 chars wide
@@ -162,269 +178,274 @@ def apply_patch(dxf_path: Union[str, Path], patch: Dict) -> List[str]:
                         else:
                             modified[var_idx + 3] = str(value)  # Default
                     else:
-                        print(f"  Variable {var_name} not found, skipping (update_existing mode)")
+                        logger.debug("  Variable %s not found, skipping (update_existing mode)", var_name)
                 else:
-                    print(f"  Unknown placement: {placement}, skipping")
+                    logger.warning("Unknown header placement: %s, skipping %s", placement, var_name)
     # 2. Apply layer renames
     if "layer_renames" in patch:
-        tables_start, tables_end = _section(modified, "TABLES")
+        tables_start, tables_end = sections.get("TABLES", (-1, -1))
+        if tables_start < 0:
+            logger.warning("Could not find TABLES section in %s", dxf_path)
         if tables_start >= 0 and tables_end >= 0:
+            layers = index["layers"]
+            
+            def _layer(layer_index: int) -> tuple[int, int]:
+                if 0 <= layer_index < len(layers):
+                    return layers[layer_index]
+                return -1, -1
+            
             for rename in patch["layer_renames"]:
                 layer_index = rename["index"]
                 new_name = rename["new"]
                 placement = rename.get("placement", "update_specific_layer")
                 
-                print(f"Processing layer rename: index {layer_index} -> {new_name} (placement: {placement})")
+                logger.debug("Processing layer rename: index %s -> %s (placement: %s)", layer_index, new_name, placement)
                 
                 # Enforce length/character rules
-                new_name = new_name[:255]
-                for c in '<>/\\":;?*|=':
-                    new_name = new_name.replace(c, "_")
+                new_name = new_name[:255].translate(_LAYER_BAD_CHARS)
                 
                 if placement == "update_layer_0":
                     # Update Layer 0 (first layer)
-                    layer_start, name_idx = _find_layer_by_index(modified[tables_start:tables_end], 0)
+                    layer_start, name_idx = _layer(0)
                     if layer_start >= 0 and name_idx >= 0:
-                        print(f"  Updating Layer 0 name at index {tables_start + name_idx + 1}")
-                        modified[tables_start + name_idx + 1] = new_name
+                        logger.debug("  Updating Layer 0 name at index %d", name_idx + 1)
+                        modified[name_idx + 1] = new_name
                     else:
-                        print(f"  Warning: Could not find Layer 0")
+                        logger.warning("Could not find Layer 0 in %s", dxf_path)
                 elif placement == "update_specific_layer":
                     # Update specific layer by index
-                    layer_start, name_idx = _find_layer_by_index(modified[tables_start:tables_end], layer_index)
+                    layer_start, name_idx = _layer(layer_index)
                     if layer_start >= 0 and name_idx >= 0:
-                        print(f"  Updating layer {layer_index} name at index {tables_start + name_idx + 1}")
-                        modified[tables_start + name_idx + 1] = new_name
+                        logger.debug("  Updating layer %s name at index %d", layer_index, name_idx + 1)
+                        modified[name_idx + 1] = new_name
                     else:
-                        print(f"  Warning: Could not find layer at index {layer_index}")
+                        logger.warning("Could not find layer at index %s in %s", layer_index, dxf_path)
                 else:
-                    print(f"  Unknown placement: {placement}, using update_specific_layer")
-                    layer_start, name_idx = _find_layer_by_index(modified[tables_start:tables_end], layer_index)
+                    logger.warning("Unknown layer placement: %s, using update_specific_layer", placement)
+                    layer_start, name_idx = _layer(layer_index)
                     if layer_start >= 0 and name_idx >= 0:
-                        modified[tables_start + name_idx + 1] = new_name
+                        modified[name_idx + 1] = new_name
     # 3. Add comments with placement options
     if "add_comments" in patch:
+        entities_start, entities_end = sections.get("ENTITIES", (-1, -1))
         for comment_data in patch["add_comments"]:
             comment = comment_data["comment"] if isinstance(comment_data, dict) else comment_data
             placement = comment_data.get("placement", "entities_end")
             
-            print(f"Adding comment: {comment[:50]}... (placement: {placement})")
+            logger.debug("Adding comment: %s... (placement: %s)", comment[:50], placement)
             
             if placement == "file_start":
-                # Insert at beginning of file
-                insert_pos = 0
-                for line in [comment[i:i+256] for i in range(0, len(comment), 256)]:
-                    modified.insert(insert_pos, "999")
-                    modified.insert(insert_pos + 1, line.strip())  # Remove any newlines
-                    insert_pos += 2
+                # Insert at beginning of file (ahead of earlier file_start comments)
+                inserts.setdefault(0, [])[:0] = _comment_lines(comment)
             elif placement == "file_end":
                 # Insert before the "  0" line that precedes EOF
-                insert_pos = len(modified) - 2  # Position before the "  0" line
-                for line in [comment[i:i+256] for i in range(0, len(comment), 256)]:
-                    modified.insert(insert_pos, "999")
-                    modified.insert(insert_pos + 1, line.strip())  # Remove any newlines
-                    insert_pos += 2
-            elif placement == "entities_end":
-                # Insert at end of ENTITIES section
-                entities_start, entities_end = _section(modified, "ENTITIES")
-                insert_pos = entities_end if entities_end >= 0 else len(modified)
-                for line in [comment[i:i+256] for i in range(0, len(comment), 256)]:
-                    modified.insert(insert_pos, "999")
-                    modified.insert(insert_pos + 1, line.strip())  # Remove any newlines
-                    insert_pos += 2
+                inserts.setdefault(max(len(modified) - 2, 0), []).extend(_comment_lines(comment))
             else:
-                print(f"  Unknown placement: {placement}, using entities_end")
-                entities_start, entities_end = _section(modified, "ENTITIES")
+                if placement != "entities_end":
+                    logger.warning("Unknown comment placement: %s, using entities_end", placement)
+                # Insert at end of ENTITIES section
                 insert_pos = entities_end if entities_end >= 0 else len(modified)
-                for line in [comment[i:i+256] for i in range(0, len(comment), 256)]:
-                    modified.insert(insert_pos, "999")
-                    modified.insert(insert_pos + 1, line.strip())  # Remove any newlines
-                    insert_pos += 2
-
-    return modified
+                inserts.setdefault(insert_pos, []).extend(_comment_lines(comment))
+    
+    if not inserts:
+        return modified
+    
+    # Rebuild once, interleaving the pending insertions with the original lines
+    output: List[str] = []
+    for i, line in enumerate(modified):
+        block = inserts.get(i)
+        if block:
+            output.extend(block)
+        output.append(line)
+    output.extend(inserts.get(len(modified), []))
+    return output
 
 
 # Metadata extraction and comparison functions moved to dxf-metadata.py
 
 
-def main():
-    """Process LLM response JSON files and apply their annotation instructions to DXF files."""
-    # Setup directories for both AutoCAD and Inventor
-    base_results_dir = Path("execute/Zero-Shot/llm-results-zeroshot")
-    raw_data_dir = Path("raw_data")
+# Bumped whenever _build_resolver changes, so indexes cached by older code are rebuilt
+RESOLVER_CACHE_VERSION = 2
+
+
+def _build_resolver(raw_names) -> Dict[str, str]:
+    """Map every part_id that resolves to a raw DXF onto that DXF's filename."""
+    # Lower rank wins, in probe order: <id>.dxf, <id>.dxf.dxf (exists in
+    # AutoCAD directory), then the same two for <id> with its _2d suffix removed
+    # Suffixes are matched case-insensitively (e.g. P12-D013-01.DXF); the value
+    # keeps the name as it is on disk
+    ranked = {}
+    for name in raw_names:
+        lower = name.lower()
+        if lower.endswith(".dxf.dxf"):
+            stem, rank = name[:-8], 1
+        elif lower.endswith(".dxf"):
+            stem, rank = name[:-4], 0
+        else:
+            continue
+        for key, key_rank in ((stem, rank), (f"{stem}_2d", rank + 2)):
+            if key not in ranked or key_rank < ranked[key][0]:
+                ranked[key] = (key_rank, name)
+    return {key: name for key, (_, name) in ranked.items()}
+
+
+def _try_stat(path: Path) -> os.stat_result | None:
+    """stat() a path, returning None instead of raising if it is missing."""
+    try:
+        return os.stat(path)
+    except OSError:
+        return None
+
+
+def _load_resolver(raw_subdir: Path, mtime_ns: int, cache_path: Path) -> Dict[str, str]:
+    """Return the part_id -> DXF filename index for raw_subdir.
     
-    if not base_results_dir.exists():
-        print(f"Error: Results directory not found at {base_results_dir}")
-        return
+    The index is cached on disk and rebuilt only when the directory's mtime
+    (``mtime_ns``, from the caller's stat) changes; adding, removing or
+    renaming a file updates it.
+    """
+    try:
+        raw = cache_path.read_bytes()
+        entry = orjson.loads(raw) if orjson else json.loads(raw)
+        if (entry.get("version") == RESOLVER_CACHE_VERSION and entry["raw_subdir"] == str(raw_subdir)
+                and entry["mtime_ns"] == mtime_ns):
+            return entry["resolver"]
+    except (OSError, ValueError, KeyError, TypeError):
+        pass
     
-    # Process both AutoCAD and Inventor
-    subdirectories = ["autocad", "inventor"]
+    with os.scandir(raw_subdir) as it:
+        resolver = _build_resolver(entry.name for entry in it)
     
-    for subdirectory in subdirectories:
-        print(f"\n{'='*50}")
-        print(f"Processing {subdirectory.upper()} files...")
-        print(f"{'='*50}")
+    try:
+        cache_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = cache_path.with_name(f"{cache_path.name}.{os.getpid()}.tmp")
+        entry = {"version": RESOLVER_CACHE_VERSION, "raw_subdir": str(raw_subdir),
+                 "mtime_ns": mtime_ns, "resolver": resolver}
+        tmp_path.write_bytes(orjson.dumps(entry) if orjson else json.dumps(entry).encode("utf-8"))
+        os.replace(tmp_path, cache_path)
+    except OSError as e:
+        logger.warning("Could not write resolver cache %s: %s", cache_path, e)
+    return resolver
+
+
+def _process_one(json_path: Path, dxf_path: Path | None, results_dir: Path,
+                 force: bool = False) -> tuple[str, str, str]:
+    """Apply one LLM response to its DXF file (runs in a worker process).
+    
+    Unless ``force`` is set, parts whose annotated DXF is newer than both the
+    LLM response and the raw DXF are left alone.
+    
+    Returns:
+        (part_id, status, message) where status is "ok", "unchanged", "skipped" or "error"
+    """
+    # Get part_id from filename (remove _llm_response.json)
+    part_id = json_path.name[:-len("_llm_response.json")]
+    
+    if not dxf_path:
+        return part_id, "skipped", f"No DXF file found for {part_id}, skipping..."
+    
+    output_path = results_dir / f"{part_id}_annotated.dxf"
+    if not force:
+        try:
+            newest_input = max(json_path.stat().st_mtime_ns, dxf_path.stat().st_mtime_ns)
+            if output_path.stat().st_mtime_ns > newest_input:
+                return part_id, "unchanged", f"{part_id} is up to date, skipping"
+        except OSError:
+            pass
+    
+    try:
+        # Load LLM response which contains the annotation instructions
+        raw = json_path.read_bytes()
+        response = orjson.loads(raw) if orjson else json.loads(raw)
+        if "error" in response:
+            return part_id, "skipped", f"LLM response for {part_id} is an error ({response['error']}), skipping..."
+        # Saved results wrap the instructions; bare instruction files are accepted too
+        patch = response.get("annotation_instructions", response)
         
-        results_dir = base_results_dir / subdirectory
-        raw_subdir = raw_data_dir / subdirectory.capitalize()
+        # Apply these instructions to the DXF
+        modified = apply_patch(dxf_path, patch)
         
-        if not results_dir.exists():
-            print(f"Warning: Results directory not found at {results_dir}, skipping...")
-            continue
-            
-        if not raw_subdir.exists():
-            print(f"Warning: Raw data directory not found at {raw_subdir}, skipping...")
-            continue
+        # Save annotated DXF in the same folder as the LLM response
+        with open(output_path, 'w', encoding='utf-8') as f:
+            f.writelines(f"{line}\n" for line in modified)
+        return part_id, "ok", f"✅ Wrote annotated DXF to: {output_path}"
+    except Exception as e:
+        return part_id, "error", f"Error processing {part_id}: {e}"
 
-        # Process each LLM response JSON file
-        json_files = list(results_dir.glob("*_llm_response.json"))
-        print(f"Found {len(json_files)} LLM response files in {subdirectory}")
-        
-        for json_path in json_files:
-            # Get part_id from filename (remove _llm_response.json)
-            part_id = json_path.stem.replace("_llm_response", "")
-            
-            # Find corresponding DXF file in raw_data
-            dxf_path = None
-            
-            # Try exact match first
-            candidate = raw_subdir / f"{part_id}.dxf"
-            if candidate.exists():
-                dxf_path = candidate
-            else:
-                # Try double extension (.dxf.dxf) which exists in AutoCAD directory
-                candidate = raw_subdir / f"{part_id}.dxf.dxf"
-                if candidate.exists():
-                    dxf_path = candidate
-                    print(f"Found DXF file for {part_id} as {part_id}.dxf.dxf")
-                else:
-                    # Try removing _2d suffix if present
-                    if part_id.endswith("_2d"):
-                        base_part_id = part_id[:-3]  # Remove "_2d"
-                        candidate = raw_subdir / f"{base_part_id}.dxf"
-                        if candidate.exists():
-                            dxf_path = candidate
-                            print(f"Found DXF file for {part_id} as {base_part_id}.dxf")
-                        else:
-                            # Try double extension with base part ID
-                            candidate = raw_subdir / f"{base_part_id}.dxf.dxf"
-                            if candidate.exists():
-                                dxf_path = candidate
-                                print(f"Found DXF file for {part_id} as {base_part_id}.dxf.dxf")
-            
-            if not dxf_path:
-                print(f"Warning: No DXF file found for {part_id}, skipping...")
-                continue
 
-            print(f"\nProcessing {part_id}...")
-            
-            try:
-                # Load LLM response which contains the annotation instructions
-                with open(json_path, 'r', encoding='utf-8') as f:
-                    patch = json.load(f)
-                
-                # Apply these instructions to the DXF
-                modified = apply_patch(dxf_path, patch)
-                
-                # Save annotated DXF in the same folder as the LLM response
-                output_path = results_dir / f"{part_id}_annotated.dxf"
-                with open(output_path, 'w', encoding='utf-8') as f:
-                    f.write('\n'.join(modified) + '\n')  # Add newline at end
-                print(f"✅ Wrote annotated DXF to: {output_path}")
-                
-            except Exception as e:
-                print(f"Error processing {part_id}: {str(e)}")
-                continue
-        
-        print(f"\nCompleted processing {subdirectory} files")
+def _process_files(json_files: List[Path], raw_subdir: Path, raw_mtime_ns: int, results_dir: Path,
+                   force: bool = False) -> None:
+    """Process LLM response files in parallel, one worker process per CPU."""
+    if not json_files:
+        return
+    # Resolve every part against the (cached) raw_data index
+    resolver = _load_resolver(raw_subdir, raw_mtime_ns, results_dir / ".cache" / "resolve.json")
+    dxf_paths = []
+    for json_path in json_files:
+        name = resolver.get(json_path.name[:-len("_llm_response.json")])
+        dxf_paths.append(raw_subdir / name if name else None)
+    
+    n = len(json_files)
+    with ProcessPoolExecutor(max_workers=min(os.cpu_count() or 1, n)) as executor:
+        results = executor.map(_process_one, json_files, dxf_paths, [results_dir] * n, [force] * n,
+                               chunksize=8)
+        for part_id, status, message in results:
+            if status in ("ok", "unchanged"):
+                logger.info(message)
+            elif status == "skipped":
+                logger.warning(message)
+            else:
+                logger.error(message)
 
 
-if __name__ == "__main__":
-    # Process both AutoCAD and Inventor folders
-    base_results_dir = Path("execute/Zero-Shot/llm-results-zeroshot")
-    raw_data_dir = Path("raw_data")
+def main(base_results_dir: Path = Path("execute/Zero-Shot/llm-results-zeroshot"),
+         raw_data_dir: Path = Path("raw_data"), force: bool = False) -> int:
+    """Process LLM response JSON files and apply their annotation instructions to DXF files.
+    
+    Args:
+        force: Re-annotate every part, even if its output is newer than its inputs
     
+    Returns:
+        Process exit status (1 if the results directory is missing)
+    """
     if not base_results_dir.exists():
-        print(f"Error: Results directory not found at {base_results_dir}")
-        sys.exit(1)
+        logger.error("Results directory not found at %s", base_results_dir)
+        return 1
     
     # Process both AutoCAD and Inventor
     subdirectories = ["autocad", "inventor"]
     
     for subdirectory in subdirectories:
-        print(f"\n{'='*50}")
-        print(f"Processing {subdirectory.upper()} files...")
-        print(f"{'='*50}")
+        logger.info("Processing %s files...", subdirectory.upper())
         
         results_dir = base_results_dir / subdirectory
         raw_subdir = raw_data_dir / subdirectory.capitalize()
         
         if not results_dir.exists():
-            print(f"Warning: Results directory not found at {results_dir}, skipping...")
+            logger.warning("Results directory not found at %s, skipping...", results_dir)
             continue
             
-        if not raw_subdir.exists():
-            print(f"Warning: Raw data directory not found at {raw_subdir}, skipping...")
+        raw_stat = _try_stat(raw_subdir)
+        if raw_stat is None:
+            logger.warning("Raw data directory not found at %s, skipping...", raw_subdir)
             continue
 
         # Process each LLM response JSON file
-        json_files = list(results_dir.glob("*_llm_response.json"))
-        print(f"Found {len(json_files)} LLM response files in {subdirectory}")
+        with os.scandir(results_dir) as it:
+            json_files = [Path(entry.path) for entry in it if entry.name.endswith("_llm_response.json")]
+        logger.info("Found %d LLM response files in %s", len(json_files), subdirectory)
         
-        for json_path in json_files:
-            # Get part_id from filename (remove _llm_response.json)
-            part_id = json_path.stem.replace("_llm_response", "")
-            
-            # Find corresponding DXF file in raw_data
-            dxf_path = None
-            
-            # Try exact match first
-            candidate = raw_subdir / f"{part_id}.dxf"
-            if candidate.exists():
-                dxf_path = candidate
-            else:
-                # Try double extension (.dxf.dxf) which exists in AutoCAD directory
-                candidate = raw_subdir / f"{part_id}.dxf.dxf"
-                if candidate.exists():
-                    dxf_path = candidate
-                    print(f"Found DXF file for {part_id} as {part_id}.dxf.dxf")
-                else:
-                    # Try removing _2d suffix if present
-                    if part_id.endswith("_2d"):
-                        base_part_id = part_id[:-3]  # Remove "_2d"
-                        candidate = raw_subdir / f"{base_part_id}.dxf"
-                        if candidate.exists():
-                            dxf_path = candidate
-                            print(f"Found DXF file for {part_id} as {base_part_id}.dxf")
-                        else:
-                            # Try double extension with base part ID
-                            candidate = raw_subdir / f"{base_part_id}.dxf.dxf"
-                            if candidate.exists():
-                                dxf_path = candidate
-                                print(f"Found DXF file for {part_id} as {base_part_id}.dxf.dxf")
-            
-            if not dxf_path:
-                print(f"Warning: No DXF file found for {part_id}, skipping...")
-                continue
-
-            print(f"\nProcessing {part_id}...")
-            
-            try:
-                # Load LLM response which contains the annotation instructions
-                with open(json_path, 'r', encoding='utf-8') as f:
-                    patch = json.load(f)
-                
-                # Apply these instructions to the DXF
-                modified = apply_patch(dxf_path, patch)
-                
-                # Save annotated DXF in the same folder as the LLM response
-                output_path = results_dir / f"{part_id}_annotated.dxf"
-                with open(output_path, 'w', encoding='utf-8') as f:
-                    f.write('\n'.join(modified) + '\n')  # Add newline at end
-                print(f"✅ Wrote annotated DXF to: {output_path}")
-                
-            except Exception as e:
-                print(f"Error processing {part_id}: {str(e)}")
-                continue
+        _process_files(json_files, raw_subdir, raw_stat.st_mtime_ns, results_dir, force=force)
         
-        print(f"\nCompleted processing {subdirectory} files")
+        logger.info("Completed processing %s files", subdirectory)
+    
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Apply LLM annotation instructions to DXF files")
+    parser.add_argument("--force", action="store_true",
+                        help="Re-annotate every part, even if its annotated DXF is newer than its inputs")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    sys.exit(main(force=args.force))
@@ -3,31 +3,40 @@ from __future__ import annotations
 
 from pathlib import Path
 from typing import Dict, List
+import argparse
 import json
 import sys
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 RAW_DATA_DIR = Path("data")
 OUTPUT_DIR = Path("execute/parsed-results")
 OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
 
 def _load_lines(path: Path) -> List[str]:
-    txt = path.read_text(encoding="utf-8", errors="ignore")
-    return [line.strip() for line in txt.splitlines()]
+    # Stream line by line so the whole file is never held as one string;
+    # newline="" still splits on \n, \r\n and bare \r, strip() drops them
+    with open(path, 'r', encoding="utf-8", errors="ignore", newline="") as f:
+        return [line.strip() for line in f]
 
 
 def extract_context(dxf_path: str | Path) -> Dict[str, object]:
     """Convert entire DXF file to JSON format."""
     path = Path(dxf_path)
     lines = _load_lines(path)
+    n = len(lines)
     
     # Convert the entire DXF to a structured format
     dxf_json = {
         "file_info": {
             "filename": path.name,
-            "total_lines": len(lines),
+            "path": str(path),  # raw lines are read back from here by get_raw_lines()
+            "total_lines": n,
             "file_size_bytes": path.stat().st_size
         },
-        "raw_lines": lines,  # Include all lines for complete context
         "sections": {},
         "header_variables": {},
         "layers": [],
@@ -36,82 +45,76 @@ def extract_context(dxf_path: str | Path) -> Dict[str, object]:
         "analysis": {}
     }
     
-    # Parse sections and extract structured data
-    current_section = None
-    in_header = False
-    in_tables = False
-    in_entities = False
+    sections = dxf_json["sections"]
+    header_variables = dxf_json["header_variables"]
+    layers = dxf_json["layers"]
+    comments = dxf_json["comments"]
+    entities = dxf_json["entities"]
+    comment_texts = []  # collected alongside comments for the analysis block
     
-    for i, line in enumerate(lines):
-        line_stripped = line.strip()
-        
-        # Detect section boundaries
-        if line_stripped == "0" and i + 1 < len(lines) and lines[i + 1].strip().upper() == "SECTION":
-            if i + 3 < len(lines):
-                section_name = lines[i + 3].strip().upper()
-                if section_name == "HEADER":
-                    current_section = "HEADER"
-                    in_header = True
-                    dxf_json["sections"]["header"] = {"start_line": i, "end_line": None}
-                elif section_name == "TABLES":
-                    current_section = "TABLES"
-                    in_tables = True
-                    in_header = False
-                    dxf_json["sections"]["tables"] = {"start_line": i, "end_line": None}
-                elif section_name == "ENTITIES":
-                    current_section = "ENTITIES"
-                    in_entities = True
-                    in_tables = False
-                    dxf_json["sections"]["entities"] = {"start_line": i, "end_line": None}
+    # Walk the file as (group code, value) pairs: tag k sits on lines 2k and 2k+1
+    state = None  # "header", "tables" or "entities" while inside that section
+    in_layer = False  # inside a LAYER table entry whose name (code 2) is still to come
+    pairs = iter(range(0, n - 1, 2))
+    for i in pairs:
+        code = lines[i]
+        value = lines[i + 1]
         
-        # Detect section ends
-        elif line_stripped == "0" and i + 1 < len(lines) and lines[i + 1].strip().upper() == "ENDSEC":
-            if current_section:
-                dxf_json["sections"][current_section.lower()]["end_line"] = i
-                current_section = None
-                in_header = False
-                in_tables = False
-                in_entities = False
+        if code == "0":
+            value_upper = value.upper()
+            in_layer = False
+            
+            # Detect section boundaries; the section name is the next (2, NAME) pair
+            if value_upper == "SECTION":
+                j = next(pairs, None)
+                if j is None:
+                    break
+                section_name = lines[j + 1].upper()
+                if section_name in ("HEADER", "TABLES", "ENTITIES"):
+                    state = section_name.lower()
+                    sections[state] = {"start_line": i, "end_line": None}
+            
+            # Detect section ends
+            elif value_upper == "ENDSEC":
+                if state:
+                    sections[state]["end_line"] = i
+                    state = None
+            
+            # Extract entities (basic structure)
+            elif state == "entities":
+                entities.append({
+                    "type": value_upper,
+                    "line_number": i + 1
+                })
+            
+            # Layer entries carry their name in a later (2, name) pair
+            elif state == "tables" and value_upper == "LAYER":
+                in_layer = True
         
         # Extract header variables
-        elif in_header and line_stripped == "9" and i + 3 < len(lines):
-            var_name = lines[i + 1].strip()
-            gcode = lines[i + 2].strip()
-            value = lines[i + 3].strip()
-            dxf_json["header_variables"][var_name] = {
-                "gcode": gcode,
-                "value": value,
+        elif state == "header" and code == "9" and i + 3 < n:
+            header_variables[value] = {
+                "gcode": lines[i + 2],
+                "value": lines[i + 3],
                 "line_number": i + 1
             }
         
         # Extract comments
-        elif line_stripped == "999" and i + 1 < len(lines):
-            comment = lines[i + 1].strip()
-            dxf_json["comments"].append({
-                "comment": comment,
+        elif code == "999":
+            comments.append({
+                "comment": value,
                 "line_number": i + 1
             })
+            comment_texts.append(value)
         
         # Extract layers
-        elif in_tables and line_stripped == "0" and i + 1 < len(lines) and lines[i + 1].strip().upper() == "LAYER":
-            # Find layer name
-            for j in range(i, min(i + 20, len(lines))):
-                if lines[j].strip() == "2" and j + 1 < len(lines):
-                    layer_name = lines[j + 1].strip()
-                    dxf_json["layers"].append({
-                        "name": layer_name,
-                        "line_number": j + 1,
-                        "index": len(dxf_json["layers"])
-                    })
-                    break
-        
-        # Extract entities (basic structure)
-        elif in_entities and line_stripped == "0" and i + 1 < len(lines):
-            entity_type = lines[i + 1].strip().upper()
-            dxf_json["entities"].append({
-                "type": entity_type,
-                "line_number": i + 1
+        elif in_layer and code == "2":
+            layers.append({
+                "name": value,
+                "line_number": i + 1,
+                "index": len(layers)
             })
+            in_layer = False
     
     # Add analysis for LLM
     dxf_json["analysis"] = {
@@ -122,31 +125,56 @@ def extract_context(dxf_path: str | Path) -> Dict[str, object]:
         "layer_0_name": dxf_json["layers"][0]["name"] if dxf_json["layers"] else "NOT_FOUND",
         "total_comments": len(dxf_json["comments"]),
         "total_entities": len(dxf_json["entities"]),
-        "existing_comment_texts": [c["comment"] for c in dxf_json["comments"]]
+        "existing_comment_texts": comment_texts
     }
     
     return dxf_json
 
 
+def get_raw_lines(json_path: str | Path, section: str | None = None) -> List[str]:
+    """Read the stripped DXF lines behind an extracted JSON file.
+    
+    With ``section`` ("header", "tables" or "entities") only that section's
+    lines are returned, using the recorded start/end line numbers.
+    """
+    with open(json_path, 'rb') as f:
+        raw = f.read()
+    dxf_json = orjson.loads(raw) if orjson else json.loads(raw)
+    lines = _load_lines(Path(dxf_json["file_info"]["path"]))
+    if section is None:
+        return lines
+    bounds = dxf_json["sections"][section]
+    end = bounds["end_line"]
+    return lines[bounds["start_line"]:None if end is None else end + 2]
+
+
 def main():
-    if len(sys.argv) > 1:
-        dxf_path = sys.argv[1]
-        process_dxf(dxf_path)
+    parser = argparse.ArgumentParser(description="Convert DXF files to structured JSON")
+    parser.add_argument("dxf_path", nargs="?",
+                        help=f"DXF file to convert (default: every *.dxf in {RAW_DATA_DIR})")
+    parser.add_argument("--pretty", action="store_true",
+                        help="Indent the JSON output for reading (default: compact)")
+    args = parser.parse_args()
+    if args.dxf_path:
+        process_dxf(args.dxf_path, pretty=args.pretty)
     else:
         if not RAW_DATA_DIR.exists():
             print(f"Error: {RAW_DATA_DIR} directory not found.")
             sys.exit(1)
         for dxf_file in RAW_DATA_DIR.glob("*.dxf"):
-            process_dxf(dxf_file)
+            process_dxf(dxf_file, pretty=args.pretty)
 
 
-def process_dxf(dxf_path):
+def process_dxf(dxf_path, pretty: bool = False):
     digest = extract_context(dxf_path)
     out_path = OUTPUT_DIR / Path(dxf_path).with_suffix('.json').name
-    with open(out_path, 'w', encoding='utf-8') as f:
-        json.dump(digest, f, indent=2)
+    if orjson:
+        out_path.write_bytes(orjson.dumps(digest, option=orjson.OPT_INDENT_2 if pretty else 0))
+    else:
+        with open(out_path, 'w', encoding='utf-8') as f:
+            json.dump(digest, f, indent=2 if pretty else None, separators=None if pretty else (",", ":"))
     print(f"✅ Wrote JSON to: {out_path}")
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -14,41 +14,65 @@ import subprocess
 import sys
 from pathlib import Path
 import json
+import os
 import time
 import importlib.util
+from concurrent.futures import ProcessPoolExecutor
 
 # Configuration
 RAW_DATA_DIR = Path("data")
 OUTPUT_DIR = Path("execute/parsed-results")
 DXF_OUTPUT_DIR = OUTPUT_DIR  # Default, but will be set per run
+PARSER_CODE_DIR = Path("execute/parser-code")
 
-def run_combined_parser(subdirectory):
-    """Run the combined parser for a specific subdirectory."""
+# DXF files are independent, so they are extracted in a process pool
+MAX_WORKERS = max(1, (os.cpu_count() or 2) - 1)
+
+def load_combined_parser():
+    """Import execute/parser-code/combined-parser.py as the module combined_parser."""
+    if "combined_parser" in sys.modules:
+        return sys.modules["combined_parser"]
+    
+    # Add parser-code to path
+    sys.path.append(str(PARSER_CODE_DIR))
+    
+    # Import the combined-parser.py file
+    spec = importlib.util.spec_from_file_location(
+        "combined_parser", 
+        PARSER_CODE_DIR / "combined-parser.py"
+    )
+    combined_parser_module = importlib.util.module_from_spec(spec)
+    # Register the module so the process-pool workers it defines can be pickled by name
+    sys.modules[spec.name] = combined_parser_module
+    try:
+        spec.loader.exec_module(combined_parser_module)
+    except BaseException:
+        del sys.modules[spec.name]
+        raise
+    return combined_parser_module
+
+# The combined parser's pool workers start by re-importing this script as __mp_main__
+# (spawn/forkserver); load the parser module there too so its workers can be unpickled
+if __name__ == "__mp_main__" and (PARSER_CODE_DIR / "combined-parser.py").exists():
+    load_combined_parser()
+
+def run_combined_parser(subdirectory, use_layout=True):
+    """Run the combined parser for a specific subdirectory.
+    
+    use_layout=False extracts PDF text with pypdf instead of pdfplumber's layout mode.
+    """
     print(f"\n{'='*60}")
     print(f"RUNNING COMBINED PARSER FOR: {subdirectory}")
     print(f"{'='*60}")
     
     try:
         # Import and run the combined parser
-        import sys
-        import importlib.util
-        
-        # Add parser-code to path
-        parser_code_path = Path("execute/parser-code")
-        sys.path.append(str(parser_code_path))
-        
-        # Import the combined-parser.py file
-        spec = importlib.util.spec_from_file_location(
-            "combined_parser", 
-            parser_code_path / "combined-parser.py"
-        )
-        combined_parser_module = importlib.util.module_from_spec(spec)
-        spec.loader.exec_module(combined_parser_module)
+        combined_parser_module = load_combined_parser()
         
         # Get the CombinedParser class
         CombinedParser = combined_parser_module.CombinedParser
         
-        parser = CombinedParser(subdirectory=subdirectory)
+        parser = CombinedParser(subdirectory=subdirectory, use_layout=use_layout)
         results = parser.parse_all()
         
         print(f"✅ Combined parser completed for {subdirectory}")
@@ -77,27 +101,24 @@ def run_dxf_extractor(subdirectory):
         dxf_output_dir = DXF_OUTPUT_DIR / subdirectory
         dxf_output_dir.mkdir(parents=True, exist_ok=True)
         
-        # Process each DXF file directly
+        # Extract DXF metadata in worker processes; results are written here in input order
         processed_count = 0
-        for dxf_file in dxf_files:
-            try:
-                print(f"Processing DXF: {dxf_file.name}")
-                
-                # Extract DXF metadata directly
-                metadata = extract_dxf_metadata(dxf_file)
-                
-                # Save to the correct location with _dxf suffix
-                part_name = dxf_file.stem
-                output_path = dxf_output_dir / f"{part_name}_dxf.json"
-                
-                with open(output_path, 'w', encoding='utf-8') as f:
-                    json.dump(metadata, f, indent=2, ensure_ascii=False)
-                
-                print(f"✅ Processed: {dxf_file.name} -> {output_path.name}")
-                processed_count += 1
-                
-            except Exception as e:
-                print(f"❌ Error processing {dxf_file.name}: {e}")
+        with ProcessPoolExecutor(max_workers=min(MAX_WORKERS, len(dxf_files))) as executor:
+            results = executor.map(extract_dxf_metadata, dxf_files, chunksize=4)
+            for dxf_file, metadata in zip(dxf_files, results):
+                try:
+                    # Save to the correct location with _dxf suffix
+                    part_name = dxf_file.stem
+                    output_path = dxf_output_dir / f"{part_name}_dxf.json"
+                    
+                    with open(output_path, 'w', encoding='utf-8') as f:
+                        json.dump(metadata, f, indent=2, ensure_ascii=False)
+                    
+                    print(f"✅ Processed: {dxf_file.name} -> {output_path.name}")
+                    processed_count += 1
+                    
+                except Exception as e:
+                    print(f"❌ Error processing {dxf_file.name}: {e}")
         
         print(f"✅ DXF extractor completed: {processed_count} files processed")
         return True
@@ -153,42 +174,57 @@ def create_summary_report(subdirectory):
 def extract_dxf_metadata(dxf_path: Path) -> dict:
     """Extract DXF metadata directly without external script."""
     try:
-        # Load DXF lines
-        txt = dxf_path.read_text(encoding="utf-8", errors="ignore")
-        lines = [line.strip() for line in txt.splitlines()]
-        
         # Extract basic metadata
         metadata = {
             "file_path": str(dxf_path),
             "file_name": dxf_path.name,
             "part_name": dxf_path.stem,
-            "total_lines": len(lines),
+            "total_lines": 0,
             "dxf_version": None,
             "layers": [],
-            "comments_present": any(l == "999" for l in lines),
+            "comments_present": False,
             "header_variables": {}
         }
+        header_variables = metadata["header_variables"]
+        layers = metadata["layers"]
         
-        # Extract DXF version and header variables
-        for i in range(len(lines) - 1):
-            if lines[i] == "9" and i + 1 < len(lines):
-                var_name = lines[i + 1]
-                if var_name == "$ACADVER" and i + 3 < len(lines):
-                    metadata["dxf_version"] = lines[i + 3]
-                elif var_name.startswith("$") and i + 3 < len(lines):
-                    try:
-                        value = float(lines[i + 3])
-                        metadata["header_variables"][var_name] = value
-                    except ValueError:
-                        metadata["header_variables"][var_name] = lines[i + 3]
+        total_lines = 0
+        var_name = None   # header variable whose value is the next pair
+        in_layer = False  # inside a LAYER table entry, waiting for its name (code 2)
         
-        # Extract layer information
-        for i in range(len(lines) - 3):
-            if (lines[i] == "0" and lines[i + 1].upper() == "LAYER" and 
-                i + 3 < len(lines) and lines[i + 2] == "2"):
-                layer_name = lines[i + 3]
-                metadata["layers"].append(layer_name)
+        # Stream the file as (group code, value) line pairs in a single pass
+        with open(dxf_path, 'r', encoding='utf-8', errors='ignore') as f:
+            lines = (line.strip() for line in f)
+            for code in lines:
+                value = next(lines, None)
+                if value is None:
+                    total_lines += 1
+                    break
+                total_lines += 2
+                
+                if var_name is not None:
+                    # Extract DXF version and header variables
+                    if var_name == "$ACADVER":
+                        metadata["dxf_version"] = value
+                    else:
+                        try:
+                            header_variables[var_name] = float(value)
+                        except ValueError:
+                            header_variables[var_name] = value
+                    var_name = None
+                elif code == "9":
+                    if value.startswith("$"):
+                        var_name = value
+                elif code == "0":
+                    in_layer = value.upper() == "LAYER"
+                elif code == "2" and in_layer:
+                    # Extract layer information
+                    layers.append(value)
+                    in_layer = False
+                elif code == "999":
+                    metadata["comments_present"] = True
         
+        metadata["total_lines"] = total_lines
         return metadata
         
     except Exception as e:
@@ -205,12 +241,14 @@ def main():
     print("🚀 MASTER PARSER - Starting all parsers and extractors")
     print("=" * 60)
     
-    # Accept both input and output subdirectory names
-    if len(sys.argv) > 2:
-        input_subdir = sys.argv[1]
-        output_subdir = sys.argv[2]
-    elif len(sys.argv) > 1:
-        input_subdir = output_subdir = sys.argv[1]
+    # Accept both input and output subdirectory names, plus an optional --plain-text flag
+    args = [arg for arg in sys.argv[1:] if arg != "--plain-text"]
+    use_layout = "--plain-text" not in sys.argv
+    if len(args) > 1:
+        input_subdir = args[0]
+        output_subdir = args[1]
+    elif args:
+        input_subdir = output_subdir = args[0]
     else:
         input_subdir = output_subdir = "Inventor"
     
@@ -237,7 +275,7 @@ def main():
     total_parsers = 2
     
     # Run combined parser
-    if run_combined_parser(input_subdir):
+    if run_combined_parser(input_subdir, use_layout=use_layout):
         success_count += 1
     
     # Run DXF extractor
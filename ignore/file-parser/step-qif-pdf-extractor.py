@@ -9,6 +9,9 @@ It processes all supported file types and generates unified metadata output.
 import pdfplumber
 import json
 import csv
+import io
+import mmap
+import multiprocessing
 import re
 import pandas as pd
 from pathlib import Path
@@ -16,6 +19,16 @@ import os
 import traceback
 import numpy as np
 from collections import Counter, defaultdict
+from functools import partial
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+try:
+    import orjson
+except ImportError:
+    orjson = None
+try:
+    from pypdf import PdfReader
+except ImportError:
+    PdfReader = None
 
 # Try to import OCC libraries for STEP parsing
 try:
@@ -30,6 +43,7 @@ try:
     from OCC.Core.TopoDS import topods
     from OCC.Core.GProp import GProp_GProps
     from OCC.Core.BRepGProp import brepgprop
+    from OCC.Core.BRepTools import breptools
     from OCC.Core.gp import gp_Vec, gp_Pnt, gp_Dir
     OCC_AVAILABLE = True
 except ImportError:
@@ -41,40 +55,131 @@ RAW_DATA_DIR = Path("data")
 OUTPUT_DIR = Path("execute/parsed-results")
 OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
 
+# QIF parser patterns (bytes, searched directly over the memory-mapped file)
+QIF_MATERIAL_RE = re.compile(rb"<Text>Material:\s*(.*?)</Text>", re.IGNORECASE)
+QIF_THICKNESS_RE = re.compile(rb"<Text>Thickness:\s*([\d.,]+\s*mm)", re.IGNORECASE)
+
 # STEP parser configuration
 MIN_FACE_AREA = 10.0
 NUM_SAMPLE_POINTS = 100000
 PARALLEL_TOLERANCE = 0.01
 
+# Sheet metal thickness range in mm
+MIN_SHEET_THICKNESS = 0.6
+MAX_SHEET_THICKNESS = 25
+
+# Files are independent, so each parser maps its per-file work over a shared process pool
+MAX_WORKERS = max(1, (os.cpu_count() or 2) - 1)
+PDF_PAGE_CHUNK = 64  # PDFs with more pages are extracted in page ranges of this size
+
+
+def _xyz(v):
+    """Coordinates of an OCC point/direction as a float64 array."""
+    return np.array([v.X(), v.Y(), v.Z()], dtype=np.float64)
+
+
+def _map_files(fn, paths, executor=None):
+    """Map fn over paths, in the process pool when one is given (input order is kept)."""
+    if executor is None:
+        return map(fn, paths)
+    return executor.map(fn, paths, chunksize=4)
+
+
 class PDFParser:
     """PDF parser for extracting all text content."""
     
-    def __init__(self, raw_data_dir, output_dir):
+    def __init__(self, raw_data_dir, output_dir, use_layout=True):
         self.raw_data_dir = raw_data_dir
         self.output_dir = output_dir
+        self.cache_dir = output_dir / ".cache"
+        # With use_layout=False, plain text is read with pypdf (when installed), which
+        # skips pdfplumber's character-level layout work
+        self.use_layout = use_layout
     
-    def extract_text_from_pdf(self, pdf_path: Path) -> str:
-        """Extract all text from a PDF file."""
-        text = []
+    def extract_text_from_pdf(self, pdf_path: Path, start: int = 0, end: int | None = None) -> str:
+        """Extract all text from a PDF file (or from its pages start..end-1)."""
+        if not self.use_layout and PdfReader is not None:
+            page_texts = (page.extract_text() for page in PdfReader(pdf_path).pages[start:end])
+            return '\n'.join(page_text for page_text in page_texts if page_text)
+        
+        text = io.StringIO()
         with pdfplumber.open(pdf_path) as pdf:
-            for page in pdf.pages:
+            for page in pdf.pages[start:end]:
                 page_text = page.extract_text()
                 if page_text:
-                    text.append(page_text)
-        return '\n'.join(text)
+                    if text.tell():
+                        text.write('\n')
+                    text.write(page_text)
+                # Release the page's layout caches before moving on to the next one
+                page.close()
+        return text.getvalue()
     
     def extract_text_from_csv(self, csv_path: Path) -> str:
         """Extract all text from a CSV file."""
         with open(csv_path, 'r', encoding='utf-8') as f:
             return f.read()
     
-    def parse(self):
+    def cache_mode(self) -> str:
+        """Extraction mode recorded in cache file names ("layout" or "plain")."""
+        return "layout" if self.use_layout or PdfReader is None else "plain"
+    
+    def cache_path(self, pdf_path: Path) -> Path:
+        """Cache file for a PDF's extracted text, keyed by the PDF's mtime and size."""
+        st = pdf_path.stat()
+        return self.cache_dir / f"{st.st_mtime_ns}_{st.st_size}_{self.cache_mode()}_{pdf_path.name}.txt"
+    
+    def cached_entries(self) -> dict:
+        """Existing cache files for the current mode, grouped by PDF file name."""
+        entry_re = re.compile(rf"\d+_\d+_{self.cache_mode()}_(.+)\.txt")
+        entries = defaultdict(list)
+        with os.scandir(self.cache_dir) as it:
+            for entry in it:
+                match = entry_re.fullmatch(entry.name)
+                if match:
+                    entries[match.group(1)].append(Path(entry.path))
+        return entries
+    
+    def page_ranges(self, pdf_path: Path):
+        """Split a PDF into (pdf_path, start, end) tasks of at most PDF_PAGE_CHUNK pages."""
+        try:
+            with pdfplumber.open(pdf_path) as pdf:
+                num_pages = len(pdf.pages)
+        except Exception:
+            return [(pdf_path, 0, None)]  # the extraction task reports the error
+        if num_pages <= PDF_PAGE_CHUNK:
+            return [(pdf_path, 0, None)]
+        return [(pdf_path, start, start + PDF_PAGE_CHUNK) for start in range(0, num_pages, PDF_PAGE_CHUNK)]
+    
+    def parse_pdf_range(self, task):
+        """Extract one page range of a PDF; returns (pdf_path, text), text None on error."""
+        pdf_path, start, end = task
+        try:
+            return pdf_path, self.extract_text_from_pdf(pdf_path, start, end)
+        except Exception as e:
+            print(f"Error processing PDF {pdf_path.name}: {e}")
+            return pdf_path, None
+    
+    def parse_csv_file(self, csv_path: Path):
+        """Extract one CSV; returns (part_id, entry), or None on error."""
+        try:
+            text_content = self.extract_text_from_csv(csv_path)
+            print(f"Extracted text from CSV: {csv_path.name}")
+            return csv_path.stem, {
+                "content": text_content,
+                "file_path": str(csv_path)
+            }
+        except Exception as e:
+            print(f"Error processing CSV {csv_path.name}: {e}")
+            return None
+    
+    def parse(self, executor=None, files=None):
         """Parse all PDF and CSV files and extract all text content."""
         print("Starting PDF/CSV text extraction...")
         
-        # Process PDF files
-        pdf_files = list(self.raw_data_dir.rglob("*.pdf"))
-        csv_files = list(self.raw_data_dir.rglob("*.csv"))
+        if files is None:
+            files = list(self.raw_data_dir.rglob("*.pdf")) + list(self.raw_data_dir.rglob("*.csv"))
+        pdf_files = [f for f in files if f.suffix.lower() == '.pdf']
+        csv_files = [f for f in files if f.suffix.lower() == '.csv']
         
         if not pdf_files and not csv_files:
             print("No PDF or CSV files found.")
@@ -85,41 +190,67 @@ class PDFParser:
         # Extract text from all files, organized by part_id
         all_text = {}
         
-        # Process PDF files
+        # Reuse the text extracted by an earlier run for PDFs that have not changed
+        cache_paths = {}
+        pdf_text = {}
         for pdf_path in pdf_files:
             try:
-                part_id = pdf_path.stem
-                text_content = self.extract_text_from_pdf(pdf_path)
-                
-                if part_id not in all_text:
-                    all_text[part_id] = {}
-                
-                all_text[part_id]["pdf"] = {
-                    "content": text_content,
-                    "file_path": str(pdf_path)
-                }
-                print(f"Extracted text from PDF: {pdf_path.name}")
-            except Exception as e:
+                cache_paths[pdf_path] = cache_path = self.cache_path(pdf_path)
+            except OSError as e:
                 print(f"Error processing PDF {pdf_path.name}: {e}")
                 continue
+            try:
+                with open(cache_path, 'r', encoding='utf-8', newline='') as f:
+                    pdf_text[pdf_path] = f.read()
+            except OSError:
+                pass  # not cached yet
+        
+        # Process the remaining PDF files; long ones are split into page ranges so
+        # that one document can keep several workers busy
+        pdf_tasks = [task for pdf_path in cache_paths if pdf_path not in pdf_text
+                     for task in self.page_ranges(pdf_path)]
+        pdf_chunks = defaultdict(list)
+        worker = partial(_parse_pdf_range, self.raw_data_dir, self.output_dir, self.use_layout)
+        for pdf_path, text_content in _map_files(worker, pdf_tasks, executor):
+            pdf_chunks[pdf_path].append(text_content)
+        
+        cached_entries = {}
+        if pdf_chunks:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            cached_entries = self.cached_entries()
+        for pdf_path, chunks in pdf_chunks.items():
+            if None in chunks:
+                continue  # the failing range has already been reported
+            text_content = '\n'.join(chunk for chunk in chunks if chunk)
+            pdf_text[pdf_path] = text_content
+            cache_path = cache_paths[pdf_path]
+            tmp_path = cache_path.with_name(cache_path.name + ".tmp")
+            try:
+                with open(tmp_path, 'w', encoding='utf-8', newline='') as f:
+                    f.write(text_content)
+                os.replace(tmp_path, cache_path)
+                # Drop the entries left by earlier versions of this PDF
+                for old_path in cached_entries.get(pdf_path.name, ()):
+                    if old_path != cache_path:
+                        old_path.unlink(missing_ok=True)
+            except OSError as e:
+                print(f"Could not write PDF text cache {cache_path.name}: {e}")
+        
+        for pdf_path in pdf_files:
+            if pdf_path not in pdf_text:
+                continue
+            all_text.setdefault(pdf_path.stem, {})["pdf"] = {
+                "content": pdf_text[pdf_path],
+                "file_path": str(pdf_path)
+            }
+            print(f"Extracted text from PDF: {pdf_path.name}")
         
         # Process CSV files
-        for csv_path in csv_files:
-            try:
-                part_id = csv_path.stem
-                text_content = self.extract_text_from_csv(csv_path)
-                
-                if part_id not in all_text:
-                    all_text[part_id] = {}
-                
-                all_text[part_id]["csv"] = {
-                    "content": text_content,
-                    "file_path": str(csv_path)
-                }
-                print(f"Extracted text from CSV: {csv_path.name}")
-            except Exception as e:
-                print(f"Error processing CSV {csv_path.name}: {e}")
+        for result in _map_files(partial(_parse_csv_file, self.raw_data_dir, self.output_dir), csv_files, executor):
+            if result is None:
                 continue
+            part_id, entry = result
+            all_text.setdefault(part_id, {})["csv"] = entry
         
         return all_text
 
@@ -130,25 +261,48 @@ class QIFParser:
         self.raw_data_dir = raw_data_dir
         self.output_dir = output_dir
     
-    def extract_material(self, line):
-        """Extract material from QIF line."""
-        match = re.search(r"<Text>Material:\s*(.*?)</Text>", line, re.IGNORECASE)
+    def extract_material(self, content):
+        """Extract material from QIF content (bytes or mmap)."""
+        match = QIF_MATERIAL_RE.search(content)
         if match:
-            return match.group(1).strip()
+            return match.group(1).decode("utf-8", errors="ignore").strip()
         return None
     
-    def extract_thickness(self, line):
-        """Extract thickness from QIF line."""
-        match = re.search(r"<Text>Thickness:\s*([\d.,]+\s*mm)", line, re.IGNORECASE)
+    def extract_thickness(self, content):
+        """Extract thickness from QIF content (bytes or mmap)."""
+        match = QIF_THICKNESS_RE.search(content)
         if match:
-            return match.group(1).strip()
+            return match.group(1).decode("utf-8", errors="ignore").strip()
         return None
     
-    def parse(self):
+    def parse_file(self, qif_path: Path):
+        """Extract material and thickness from one QIF; returns (part_id, entry), or None on error."""
+        try:
+            material = None
+            thickness = None
+            
+            # Search the mapped file in C; each search stops at its first match
+            with open(qif_path, "rb") as f:
+                if os.fstat(f.fileno()).st_size:
+                    with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                        material = self.extract_material(mm)
+                        thickness = self.extract_thickness(mm)
+            
+            print(f"Extracted from {qif_path.name}: material={material}, thickness={thickness}")
+            return qif_path.stem, {
+                "material": material or "N/A",
+                "thickness": thickness or "N/A",
+                "file_path": str(qif_path)
+            }
+        except Exception as e:
+            print(f"Error processing QIF {qif_path.name}: {e}")
+            return None
+    
+    def parse(self, executor=None, files=None):
         """Parse all QIF files and extract metadata."""
         print("Starting QIF parsing...")
         
-        qif_files = list(self.raw_data_dir.rglob("*.qif"))
+        qif_files = list(self.raw_data_dir.rglob("*.qif")) if files is None else files
         
         if not qif_files:
             print("No QIF files found.")
@@ -157,38 +311,8 @@ class QIFParser:
         print(f"Found {len(qif_files)} QIF files to process")
         
         # Organize results by part_id
-        all_qif_data = {}
-        
-        for qif_path in qif_files:
-            try:
-                part_id = qif_path.stem
-                material = None
-                thickness = None
-                
-                with open(qif_path, "r", encoding="utf-8", errors="ignore") as f:
-                    for line in f:
-                        if material is None:
-                            m = self.extract_material(line)
-                            if m:
-                                material = m
-                        if thickness is None:
-                            t = self.extract_thickness(line)
-                            if t:
-                                thickness = t
-                        if material and thickness:
-                            break
-                
-                all_qif_data[part_id] = {
-                    "material": material or "N/A",
-                    "thickness": thickness or "N/A",
-                    "file_path": str(qif_path)
-                }
-                print(f"Extracted from {qif_path.name}: material={material}, thickness={thickness}")
-            except Exception as e:
-                print(f"Error processing QIF {qif_path.name}: {e}")
-                continue
-        
-        return all_qif_data
+        worker = partial(_parse_qif_file, self.raw_data_dir, self.output_dir)
+        return dict(result for result in _map_files(worker, qif_files, executor) if result is not None)
 
 class STEPParser:
     """STEP parser for extracting thickness information from 3D models."""
@@ -217,23 +341,43 @@ class STEPParser:
             print(f"Error calculating distance: {str(e)}")
             return None
     
-    def analyze_distances(self, all_distances, face_pairs):
-        """Analyze distances using multi-signal voting logic to determine sheet metal thickness."""
+    def faces_overlap_in_projection(self, face1, face2, plane1, plane2):
+        """Check whether the UV bounding boxes of two parallel planar faces overlap
+        once both are projected onto plane1."""
+        position1 = plane1.Position()
+        origin1 = _xyz(position1.Location())
+        axes1 = np.array([_xyz(position1.XDirection()), _xyz(position1.YDirection())])
+        
+        extents = []
+        for face, plane in ((face1, plane1), (face2, plane2)):
+            u1, u2, v1, v2 = breptools.UVBounds(face)
+            position = plane.Position()
+            origin = _xyz(position.Location())
+            x_dir = _xyz(position.XDirection())
+            y_dir = _xyz(position.YDirection())
+            corners = np.array([origin + u * x_dir + v * y_dir for u in (u1, u2) for v in (v1, v2)])
+            projected = (corners - origin1) @ axes1.T
+            extents.append((projected.min(axis=0), projected.max(axis=0)))
+        
+        (lo1, hi1), (lo2, hi2) = extents
+        tolerance = 1e-6
+        return bool(np.all(lo1 <= hi2 + tolerance) and np.all(lo2 <= hi1 + tolerance))
+    
+    def analyze_distances(self, all_distances, face_pairs, areas):
+        """Analyze distances using multi-signal voting logic to determine sheet metal thickness.
+        
+        face_pairs holds (i, j) face indices into areas."""
         if not all_distances:
             return None, 0, "No distances found"
         
-        # Sheet metal thickness range in mm
-        MIN_SHEET_THICKNESS = 0.6
-        MAX_SHEET_THICKNESS = 25
-        
         # Step 1: Filter distances within valid range and build area-weighted clusters
         thickness_clusters = defaultdict(float)
         filtered_distances = []
         
-        for (face1, face2), distance in zip(face_pairs, all_distances):
+        for (i, j), distance in zip(face_pairs, all_distances):
             if MIN_SHEET_THICKNESS <= distance <= MAX_SHEET_THICKNESS:
-                area1 = self.get_face_area(face1)
-                area2 = self.get_face_area(face2)
+                area1 = areas[i]
+                area2 = areas[j]
                 total_area = area1 + area2
                 
                 rounded_distance = round(distance, 2)
@@ -251,24 +395,20 @@ class STEPParser:
         mode_frequency = mode_count / total
         area_thickness = max(thickness_clusters.items(), key=lambda x: x[1])[0]
         
-        # Step 3: Calculate confidence scores
-        def calculate_confidence_score(thickness, frequency, area, min_thickness):
-            norm_freq = frequency
-            norm_area = area / max(thickness_clusters.values())
-            norm_closeness = 1 - (abs(thickness - min_thickness) / min_thickness)
-            
-            alpha = 0.4  # frequency weight
-            beta = 0.3   # area weight
-            gamma = 0.3  # closeness to min weight
-            
-            return (alpha * norm_freq + beta * norm_area + gamma * norm_closeness)
+        # Step 3: Calculate confidence scores for every candidate thickness at once
+        candidates = np.fromiter(thickness_clusters.keys(), dtype=np.float64)
+        cluster_areas = np.fromiter(thickness_clusters.values(), dtype=np.float64)
+        counts = np.array([hist[t] for t in thickness_clusters], dtype=np.float64)
+        
+        norm_freq = counts / total
+        norm_area = cluster_areas / cluster_areas.max()
+        norm_closeness = 1 - (np.abs(candidates - min_thickness) / min_thickness)
         
-        candidates = set(filtered_distances)
-        scores = {}
-        for thickness in candidates:
-            freq = hist[thickness] / total
-            area = thickness_clusters[thickness]
-            scores[thickness] = calculate_confidence_score(thickness, freq, area, min_thickness)
+        alpha = 0.4  # frequency weight
+        beta = 0.3   # area weight
+        gamma = 0.3  # closeness to min weight
+        
+        scores = alpha * norm_freq + beta * norm_area + gamma * norm_closeness
         
         # Step 4: Decision logic
         min_area = thickness_clusters[min_thickness]
@@ -286,210 +426,233 @@ class STEPParser:
             thickness = mode_thickness
             method = f"Using mode (strong frequency {mode_frequency:.2f} and agrees with area-dominant)"
         else:
-            thickness = max(scores.items(), key=lambda x: x[1])[0]
-            method = f"Using highest confidence score ({scores[thickness]:.2f})"
+            best = int(scores.argmax())
+            thickness = float(candidates[best])
+            method = f"Using highest confidence score ({scores[best]:.2f})"
         
         return thickness, hist[thickness], method
     
-    def verify_parallelism_with_points(self, face1, face2, plane1, plane2, num_points=10):
-        """Verify parallelism by checking multiple points on the faces."""
+    def verify_parallelism_with_points(self, face1, face2, plane1, plane2, num_points=10, surface1=None):
+        """Verify parallelism by checking multiple points on the faces.
+        
+        surface1 may be passed in when the caller already holds face1's surface."""
         try:
-            surface1 = BRep_Tool.Surface(face1)
+            if surface1 is None:
+                surface1 = BRep_Tool.Surface(face1)
             u1, u2, v1, v2 = surface1.Bounds()
             
-            u_values = np.linspace(u1, u2, num_points)
-            v_values = np.linspace(v1, v2, num_points)
+            # face1 is planar, so its surface is origin + u * x_dir + v * y_dir: build the
+            # whole (u, v) sample grid and its distances to plane2 in one broadcast
+            position1 = plane1.Position()
+            origin1 = _xyz(position1.Location())
+            x_dir1 = _xyz(position1.XDirection())
+            y_dir1 = _xyz(position1.YDirection())
+            origin2 = _xyz(plane2.Location())
+            normal2 = _xyz(plane2.Axis().Direction())
             
-            distances = []
-            for u in u_values:
-                for v in v_values:
-                    try:
-                        pnt = surface1.Value(u, v)
-                        dist = abs(plane2.Distance(pnt))
-                        distances.append(dist)
-                    except:
-                        continue
+            u_values = np.linspace(u1, u2, num_points)[:, None, None]
+            v_values = np.linspace(v1, v2, num_points)[None, :, None]
+            points = origin1 + u_values * x_dir1 + v_values * y_dir1
+            distances = np.abs((points - origin2) @ normal2)
             
-            if not distances:
-                return False
-            
-            mean_dist = sum(distances) / len(distances)
+            mean_dist = distances.mean()
             max_deviation = mean_dist * 0.01
             
-            return all(abs(d - mean_dist) <= max_deviation for d in distances)
+            return bool(np.all(np.abs(distances - mean_dist) <= max_deviation))
         except Exception as e:
             print(f"Error verifying parallelism with points: {str(e)}")
             return False
     
-    def parse(self):
-        """Parse all STEP files and extract thickness information."""
-        if not OCC_AVAILABLE:
-            print("STEP parsing skipped - OCC libraries not available.")
-            return {}
-        
-        print("Starting STEP parsing...")
-        
-        step_files = [f for f in self.raw_data_dir.rglob("*") 
-                     if f.suffix.lower() in {'.step', '.stp', '.STEP'}]
-        
-        if not step_files:
-            print("No STEP files found.")
-            return {}
-        
-        print(f"Found {len(step_files)} STEP files to process")
-        
-        # Organize results by part_id
-        all_step_data = {}
-        
-        for step_file in step_files:
+    def parse_file(self, step_file: Path):
+        """Determine the sheet thickness of one STEP file; returns (part_id, entry)."""
+        try:
+            part_id = step_file.stem
+            print(f"\nProcessing: {step_file.name}")
+            
+            # Load the STEP file
+            step_reader = STEPControl_Reader()
+            status = step_reader.ReadFile(str(step_file))
+            
+            if status != 1:
+                print(f"Failed to read STEP file: {step_file.name}")
+                return part_id, {
+                    'thickness': 'Read Error',
+                    'occurrence_count': 0,
+                    'all_distances': 'N/A',
+                    'analysis_method': 'N/A',
+                    'file_path': str(step_file)
+                }
+            
+            step_reader.TransferRoot()
+            shape = step_reader.OneShape()
+            
+            if shape is None:
+                print(f"Warning: Shape is None for {step_file.name}")
+                return part_id, {
+                    'thickness': 'No Shape',
+                    'occurrence_count': 0,
+                    'all_distances': 'N/A',
+                    'analysis_method': 'N/A',
+                    'file_path': str(step_file)
+                }
+            
+            # Extract faces
+            faces = []
+            areas = []  # computed once here and reused when weighting thickness clusters
             try:
-                part_id = step_file.stem
-                print(f"\nProcessing: {step_file.name}")
-                
-                # Load the STEP file
-                step_reader = STEPControl_Reader()
-                status = step_reader.ReadFile(str(step_file))
-                
-                if status != 1:
-                    print(f"Failed to read STEP file: {step_file.name}")
-                    all_step_data[part_id] = {
-                        'thickness': 'Read Error',
-                        'occurrence_count': 0,
-                        'all_distances': 'N/A',
-                        'analysis_method': 'N/A',
-                        'file_path': str(step_file)
-                    }
-                    continue
+                explorer = TopExp_Explorer(shape, TopAbs_ShapeEnum(TopAbs_FACE), TopAbs_ShapeEnum(TopAbs_SHAPE))
                 
-                step_reader.TransferRoot()
-                shape = step_reader.OneShape()
+                while explorer.More():
+                    face = topods.Face(explorer.Current())
+                    area = self.get_face_area(face)
+                    if area >= MIN_FACE_AREA:
+                        faces.append(face)
+                        areas.append(area)
+                    explorer.Next()
                 
-                if shape is None:
-                    print(f"Warning: Shape is None for {step_file.name}")
-                    all_step_data[part_id] = {
-                        'thickness': 'No Shape',
-                        'occurrence_count': 0,
-                        'all_distances': 'N/A',
-                        'analysis_method': 'N/A',
-                        'file_path': str(step_file)
-                    }
-                    continue
-                
-                # Extract faces
-                faces = []
+                print(f"Found {len(faces)} faces (after filtering small faces)")
+            except Exception as e:
+                print(f"Error during face exploration: {str(e)}")
+                return part_id, {
+                    'thickness': 'Face Error',
+                    'occurrence_count': 0,
+                    'all_distances': 'N/A',
+                    'analysis_method': 'N/A',
+                    'file_path': str(step_file)
+                }
+            
+            # Collect the planar faces once, with their surfaces and planes
+            planar = []  # (face index, face, surface, plane)
+            for i, face in enumerate(faces):
                 try:
-                    explorer = TopExp_Explorer(shape, TopAbs_ShapeEnum(TopAbs_FACE), TopAbs_ShapeEnum(TopAbs_SHAPE))
-                    
-                    while explorer.More():
-                        face = topods.Face(explorer.Current())
-                        area = self.get_face_area(face)
-                        if area >= MIN_FACE_AREA:
-                            faces.append(face)
-                        explorer.Next()
-                    
-                    print(f"Found {len(faces)} faces (after filtering small faces)")
+                    surface = BRep_Tool.Surface(face)
+                    adaptor = GeomAdaptor_Surface(surface)
+                    if adaptor.GetType() == GeomAbs_Plane:
+                        planar.append((i, face, surface, adaptor.Plane()))
                 except Exception as e:
-                    print(f"Error during face exploration: {str(e)}")
-                    all_step_data[part_id] = {
-                        'thickness': 'Face Error',
-                        'occurrence_count': 0,
-                        'all_distances': 'N/A',
-                        'analysis_method': 'N/A',
-                        'file_path': str(step_file)
-                    }
-                    continue
+                    print(f"Error processing face {i}: {str(e)}")
+            
+            # Find parallel planar surfaces: screen every pair at once on the Gram
+            # matrix of unit normals (|n1 . n2| close to 1), then verify candidates
+            all_distances = []
+            face_pairs = []
+            
+            if planar:
+                normals = np.array([_xyz(plane.Axis().Direction()) for _, _, _, plane in planar])
+                origins = np.array([_xyz(plane.Location()) for _, _, _, plane in planar])
+                gram = normals @ normals.T
+                pair_a, pair_b = np.nonzero(np.triu(np.abs(np.abs(gram) - 1.0) < PARALLEL_TOLERANCE, k=1))
                 
-                # Find parallel planar surfaces
-                all_distances = []
-                face_pairs = []
+                # Parallel planes are |n1 . (o2 - o1)| apart; skip pairs whose offset cannot
+                # be a sheet thickness before the point check and the distance solve
+                offsets = np.abs(np.einsum("ij,ij->i", origins[pair_b] - origins[pair_a], normals[pair_a]))
+                offsets = np.round(offsets, 3)  # distances are compared at 3 decimals
+                in_range = (offsets >= MIN_SHEET_THICKNESS) & (offsets <= MAX_SHEET_THICKNESS)
                 
-                for i, face1 in enumerate(faces):
+                for a, b, offset in zip(pair_a[in_range], pair_b[in_range], offsets[in_range]):
+                    i, face1, surface1, plane1 = planar[a]
+                    j, face2, _, plane2 = planar[b]
+                    dot_product = gram[a, b]
                     try:
-                        surface1 = BRep_Tool.Surface(face1)
-                        adaptor1 = GeomAdaptor_Surface(surface1)
-                        
-                        if adaptor1.GetType() != GeomAbs_Plane:
-                            continue
-                        
-                        plane1 = adaptor1.Plane()
-                        normal1 = plane1.Axis().Direction()
-                        
-                        for j in range(i+1, len(faces)):
-                            try:
-                                face2 = faces[j]
-                                surface2 = BRep_Tool.Surface(face2)
-                                adaptor2 = GeomAdaptor_Surface(surface2)
-                                
-                                if adaptor2.GetType() != GeomAbs_Plane:
-                                    continue
-                                
-                                plane2 = adaptor2.Plane()
-                                normal2 = plane2.Axis().Direction()
-                                
-                                dot_product = normal1.Dot(normal2)
-                                
-                                if abs(abs(dot_product) - 1.0) < PARALLEL_TOLERANCE:
-                                    if self.verify_parallelism_with_points(face1, face2, plane1, plane2, num_points=10):
-                                        print(f"Found parallel faces {i} and {j} with dot product: {dot_product}")
-                                        
-                                        distance = self.calculate_distance_between_faces(face1, face2)
-                                        if distance is not None:
-                                            print(f"Distance between faces {i} and {j}: {distance} mm")
-                                            all_distances.append(distance)
-                                            face_pairs.append((face1, face2))
-                            except Exception as e:
-                                print(f"Error processing face pair {i}-{j}: {str(e)}")
-                                continue
+                        if self.verify_parallelism_with_points(face1, face2, plane1, plane2, num_points=10,
+                                                               surface1=surface1):
+                            print(f"Found parallel faces {i} and {j} with dot product: {dot_product}")
+                            
+                            # Where the faces lie over each other their closest points are
+                            # the plane offset apart; otherwise ask the general solver
+                            if self.faces_overlap_in_projection(face1, face2, plane1, plane2):
+                                distance = float(offset)
+                            else:
+                                distance = self.calculate_distance_between_faces(face1, face2)
+                            if distance is not None:
+                                print(f"Distance between faces {i} and {j}: {distance} mm")
+                                all_distances.append(distance)
+                                face_pairs.append((i, j))
                     except Exception as e:
-                        print(f"Error processing face {i}: {str(e)}")
-                        continue
-                
-                print(f"Found {len(face_pairs)} pairs of parallel faces")
+                        print(f"Error processing face pair {i}-{j}: {str(e)}")
+            
+            print(f"Found {len(face_pairs)} pairs of parallel faces")
+            
+            if all_distances:
+                distances_str = ', '.join(map(str, sorted(set(all_distances))))
+                thickness, count, method = self.analyze_distances(all_distances, face_pairs, areas)
                 
-                if all_distances:
-                    thickness, count, method = self.analyze_distances(all_distances, face_pairs)
-                    
-                    if thickness is not None:
-                        all_step_data[part_id] = {
-                            'thickness': thickness,
-                            'occurrence_count': count,
-                            'all_distances': ', '.join(map(str, sorted(set(all_distances)))),
-                            'analysis_method': method,
-                            'file_path': str(step_file)
-                        }
-                        print(f"Determined thickness: {thickness} mm (occurs {count} times)")
-                    else:
-                        all_step_data[part_id] = {
-                            'thickness': 'No Consistent Thickness',
-                            'occurrence_count': 0,
-                            'all_distances': ', '.join(map(str, sorted(set(all_distances)))),
-                            'analysis_method': method,
-                            'file_path': str(step_file)
-                        }
+                if thickness is not None:
+                    print(f"Determined thickness: {thickness} mm (occurs {count} times)")
+                    return part_id, {
+                        'thickness': thickness,
+                        'occurrence_count': count,
+                        'all_distances': distances_str,
+                        'analysis_method': method,
+                        'file_path': str(step_file)
+                    }
                 else:
-                    all_step_data[part_id] = {
-                        'thickness': 'No Parallel Faces',
+                    return part_id, {
+                        'thickness': 'No Consistent Thickness',
                         'occurrence_count': 0,
-                        'all_distances': 'N/A',
-                        'analysis_method': 'N/A',
+                        'all_distances': distances_str,
+                        'analysis_method': method,
                         'file_path': str(step_file)
                     }
-            except Exception as e:
-                print(f"Error processing file {step_file.name}: {str(e)}")
-                all_step_data[step_file.stem] = {
-                    'thickness': 'Processing Error',
+            else:
+                return part_id, {
+                    'thickness': 'No Parallel Faces',
                     'occurrence_count': 0,
                     'all_distances': 'N/A',
                     'analysis_method': 'N/A',
                     'file_path': str(step_file)
                 }
+        except Exception as e:
+            print(f"Error processing file {step_file.name}: {str(e)}")
+            return step_file.stem, {
+                'thickness': 'Processing Error',
+                'occurrence_count': 0,
+                'all_distances': 'N/A',
+                'analysis_method': 'N/A',
+                'file_path': str(step_file)
+            }
+    
+    def parse(self, executor=None, files=None):
+        """Parse all STEP files and extract thickness information."""
+        if not OCC_AVAILABLE:
+            print("STEP parsing skipped - OCC libraries not available.")
+            return {}
+        
+        print("Starting STEP parsing...")
         
-        return all_step_data
+        if files is None:
+            # dict.fromkeys drops the repeats that case-insensitive filesystems return
+            files = list(dict.fromkeys(path for pattern in ("*.step", "*.stp", "*.STEP", "*.STP")
+                                       for path in self.raw_data_dir.rglob(pattern)))
+        step_files = files
+        
+        if not step_files:
+            print("No STEP files found.")
+            return {}
+        
+        print(f"Found {len(step_files)} STEP files to process")
+        
+        # Organize results by part_id
+        return dict(_map_files(partial(_parse_step_file, self.raw_data_dir, self.output_dir), step_files, executor))
+
+# Process-pool workers. These are module-level and take plain arguments so that only
+# paths and flags are pickled, never a parser instance
+def _parse_pdf_range(raw_data_dir, output_dir, use_layout, task):
+    return PDFParser(raw_data_dir, output_dir, use_layout).parse_pdf_range(task)
+
+def _parse_csv_file(raw_data_dir, output_dir, csv_path):
+    return PDFParser(raw_data_dir, output_dir).parse_csv_file(csv_path)
+
+def _parse_qif_file(raw_data_dir, output_dir, qif_path):
+    return QIFParser(raw_data_dir, output_dir).parse_file(qif_path)
+
+def _parse_step_file(raw_data_dir, output_dir, step_file):
+    return STEPParser(raw_data_dir, output_dir).parse_file(step_file)
 
 class CombinedParser:
     """Main class that combines all parsers and provides unified output."""
     
-    def __init__(self, raw_data_dir=None, output_dir=None, subdirectory=None):
+    def __init__(self, raw_data_dir=None, output_dir=None, subdirectory=None, use_layout=True):
         self.raw_data_dir = raw_data_dir or RAW_DATA_DIR
         self.subdirectory = subdirectory
         self.output_dir = output_dir or OUTPUT_DIR
@@ -503,91 +666,114 @@ class CombinedParser:
         self.output_dir.mkdir(parents=True, exist_ok=True)
         
         # Initialize individual parsers
-        self.pdf_parser = PDFParser(self.raw_data_dir, self.output_dir)
+        self.pdf_parser = PDFParser(self.raw_data_dir, self.output_dir, use_layout=use_layout)
         self.qif_parser = QIFParser(self.raw_data_dir, self.output_dir)
         self.step_parser = STEPParser(self.raw_data_dir, self.output_dir)
     
+    def _scan_inputs(self):
+        """Walk raw_data_dir once and bucket the input files by lower-cased suffix."""
+        buckets = {'.pdf': [], '.csv': [], '.qif': [], '.step': [], '.stp': []}
+        for dirpath, _, filenames in os.walk(self.raw_data_dir):
+            for name in filenames:
+                ext = os.path.splitext(name)[1].lower()
+                if ext in buckets:
+                    buckets[ext].append(Path(dirpath, name))
+        return buckets
+    
     def parse_all(self):
         """Run all parsers and combine results by part."""
         print("=" * 60)
         print(f"COMBINED PARSER - Processing files from: {self.raw_data_dir}")
         print("=" * 60)
         
-        # Run all parsers
-        pdf_data = {}
-        qif_data = {}
-        step_data = {}
-        
-        try:
-            pdf_data = self.pdf_parser.parse()
-            print(f"PDF parser completed: {len(pdf_data)} parts")
-        except Exception as e:
-            print(f"PDF parser failed: {e}")
-        
-        try:
-            qif_data = self.qif_parser.parse()
-            print(f"QIF parser completed: {len(qif_data)} parts")
-        except Exception as e:
-            print(f"QIF parser failed: {e}")
+        # Scan the input tree once and hand each parser its own files
+        inputs = self._scan_inputs()
+        parsers = {
+            "PDF": (self.pdf_parser, inputs['.pdf'] + inputs['.csv']),
+            "QIF": (self.qif_parser, inputs['.qif']),
+            "STEP": (self.step_parser, inputs['.step'] + inputs['.stp']),
+        }
+        results = {}
+        
+        # Run all parsers concurrently; they touch disjoint files and share one process pool.
+        # The pool is fed from several threads, so its workers are not forked from this
+        # (multi-threaded) process: forkserver where available, spawn otherwise (Windows)
+        start_method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+        with ProcessPoolExecutor(max_workers=MAX_WORKERS,
+                                 mp_context=multiprocessing.get_context(start_method)) as executor, \
+                ThreadPoolExecutor(max_workers=len(parsers)) as threads:
+            futures = {name: threads.submit(parser.parse, executor, files)
+                       for name, (parser, files) in parsers.items()}
+            for name, future in futures.items():
+                try:
+                    results[name] = future.result()
+                    print(f"{name} parser completed: {len(results[name])} parts")
+                except Exception as e:
+                    print(f"{name} parser failed: {e}")
+                    results[name] = {}
         
-        try:
-            step_data = self.step_parser.parse()
-            print(f"STEP parser completed: {len(step_data)} parts")
-        except Exception as e:
-            print(f"STEP parser failed: {e}")
+        pdf_data = results["PDF"]
+        qif_data = results["QIF"]
+        step_data = results["STEP"]
         
         # Combine all data by part
-        all_parts = set(list(pdf_data.keys()) + list(qif_data.keys()) + list(step_data.keys()))
+        all_parts = pdf_data.keys() | qif_data.keys() | step_data.keys()
         
         print(f"\nCreating output files for {len(all_parts)} parts...")
         
-        # Create one file per part
+        # Create one file per part, popping its entries from the parser results so
+        # extracted text is released as soon as it has been written
         for part_id in all_parts:
             part_data = {
                 "part_id": part_id,
-                "pdf_data": pdf_data.get(part_id, {}),
-                "qif_data": qif_data.get(part_id, {}),
-                "step_data": step_data.get(part_id, {})
+                "pdf_data": pdf_data.pop(part_id, {}),
+                "qif_data": qif_data.pop(part_id, {}),
+                "step_data": step_data.pop(part_id, {})
             }
             
             # Save JSON file for this part
             json_path = self.output_dir / f"{part_id}.json"
-            with open(json_path, "w", encoding="utf-8") as f:
-                json.dump(part_data, f, indent=2, ensure_ascii=False)
+            if orjson:
+                json_path.write_bytes(orjson.dumps(part_data, option=orjson.OPT_INDENT_2))
+            else:
+                with open(json_path, "w", encoding="utf-8") as f:
+                    json.dump(part_data, f, indent=2, ensure_ascii=False)
             
-            # Save TXT file for this part
+            # Save TXT file for this part, assembled in memory and written once
             txt_path = self.output_dir / f"{part_id}.txt"
+            out = [f"=== PART: {part_id} ===\n\n"]
+            
+            # PDF data
+            if part_data["pdf_data"]:
+                out.append("PDF DATA:\n")
+                out.append("-" * 20 + "\n")
+                for file_type, data in part_data["pdf_data"].items():
+                    out.append(f"File Type: {file_type.upper()}\n")
+                    out.append(f"File Path: {data['file_path']}\n")
+                    out.append("Content:\n")
+                    out.append(data['content'])
+                    out.append("\n\n")
+            
+            # QIF data
+            if part_data["qif_data"]:
+                out.append("QIF DATA:\n")
+                out.append("-" * 20 + "\n")
+                out.append(f"Material: {part_data['qif_data'].get('material', 'N/A')}\n")
+                out.append(f"Thickness: {part_data['qif_data'].get('thickness', 'N/A')}\n")
+                out.append(f"File Path: {part_data['qif_data'].get('file_path', 'N/A')}\n\n")
+            
+            # STEP data
+            if part_data["step_data"]:
+                out.append("STEP DATA:\n")
+                out.append("-" * 20 + "\n")
+                out.append(f"Thickness: {part_data['step_data'].get('thickness', 'N/A')}\n")
+                out.append(f"Occurrence Count: {part_data['step_data'].get('occurrence_count', 'N/A')}\n")
+                out.append(f"All Distances: {part_data['step_data'].get('all_distances', 'N/A')}\n")
+                out.append(f"Analysis Method: {part_data['step_data'].get('analysis_method', 'N/A')}\n")
+                out.append(f"File Path: {part_data['step_data'].get('file_path', 'N/A')}\n\n")
+            
             with open(txt_path, "w", encoding="utf-8") as f:
-                f.write(f"=== PART: {part_id} ===\n\n")
-                
-                # PDF data
-                if part_data["pdf_data"]:
-                    f.write("PDF DATA:\n")
-                    f.write("-" * 20 + "\n")
-                    for file_type, data in part_data["pdf_data"].items():
-                        f.write(f"File Type: {file_type.upper()}\n")
-                        f.write(f"File Path: {data['file_path']}\n")
-                        f.write("Content:\n")
-                        f.write(data['content'])
-                        f.write("\n\n")
-                
-                # QIF data
-                if part_data["qif_data"]:
-                    f.write("QIF DATA:\n")
-                    f.write("-" * 20 + "\n")
-                    f.write(f"Material: {part_data['qif_data'].get('material', 'N/A')}\n")
-                    f.write(f"Thickness: {part_data['qif_data'].get('thickness', 'N/A')}\n")
-                    f.write(f"File Path: {part_data['qif_data'].get('file_path', 'N/A')}\n\n")
-                
-                # STEP data
-                if part_data["step_data"]:
-                    f.write("STEP DATA:\n")
-                    f.write("-" * 20 + "\n")
-                    f.write(f"Thickness: {part_data['step_data'].get('thickness', 'N/A')}\n")
-                    f.write(f"Occurrence Count: {part_data['step_data'].get('occurrence_count', 'N/A')}\n")
-                    f.write(f"All Distances: {part_data['step_data'].get('all_distances', 'N/A')}\n")
-                    f.write(f"Analysis Method: {part_data['step_data'].get('analysis_method', 'N/A')}\n")
-                    f.write(f"File Path: {part_data['step_data'].get('file_path', 'N/A')}\n\n")
+                f.write("".join(out))
             
             print(f"Created files for {part_id}: {json_path.name}, {txt_path.name}")
         
@@ -596,10 +782,10 @@ class CombinedParser:
         
         return all_parts
 
-def main():
+def main(use_layout=True):
     """Main function to run the combined parser."""
     # Start with AutoCAD folder
-    parser = CombinedParser(subdirectory="teknocer")
+    parser = CombinedParser(subdirectory="teknocer", use_layout=use_layout)
     results = parser.parse_all()
     
     print("\n" + "=" * 60)
@@ -609,4 +795,9 @@ def main():
     return results
 
 if __name__ == "__main__":
-    main()
+    import argparse
+    arg_parser = argparse.ArgumentParser(description="Run the combined PDF/QIF/STEP parser.")
+    arg_parser.add_argument("--plain-text", action="store_true",
+                            help="extract PDF text with pypdf instead of pdfplumber's layout mode")
+    args = arg_parser.parse_args()
+    main(use_layout=not args.plain_text)
@@ -2,11 +2,10 @@ import json
 import openai
 from typing import Dict, Any, List, Optional
 from pathlib import Path
-from dotenv import load_dotenv
 import os
 
-# Load environment variables from .env file
-load_dotenv()
+# Load environment variables from .env file (loaded once by config)
+import config  # noqa: F401
 
 class LLMProcessor:
     """Centralized LLM interaction manager supporting Text and Vision."""
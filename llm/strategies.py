@@ -1,6 +1,7 @@
 from abc import ABC, abstractmethod
 from typing import Dict, Any
 import json
+from config import Config
 
 class AnnotationStrategy(ABC):
     """Abstract base strategy for generating DXF annotations."""
@@ -92,8 +93,8 @@ RETURN ONLY THE JSON OBJECT
         step_data = metadata.get('step', {})
         pdf_data = metadata.get('pdf', {})
         
-        # Get CAM software from context or use default
-        cam = context.get('cam', 'CypCut') if context else 'CypCut'
+        # Get CAM software from context or use the configured default
+        cam = context.get('cam', Config.CAM_SOFTWARE) if context else Config.CAM_SOFTWARE
         
         return self.PROMPT_TEMPLATE.format(
             qif_metadata=json.dumps(qif_data, indent=2),
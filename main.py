@@ -42,9 +42,20 @@ def run_parser_pipeline(subdirectory: str):
     print(f"\n✅ Parsed {len(aggregated_results)} parts. Saving to disk...")
     
     import json
+    import os
+    dir_fd = Config.parsed_dir_fd(subdirectory)
     for part_id, data in aggregated_results.items():
         output_file = output_dir / f"{part_id}.json"
-        with open(output_file, 'w', encoding='utf-8') as f:
+        if dir_fd is not None:
+            fd = os.open(output_file.name, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o666, dir_fd=dir_fd)
+            try:
+                f = open(fd, 'w', encoding='utf-8')
+            except BaseException:
+                os.close(fd)  # open() did not take ownership of fd
+                raise
+        else:
+            f = open(output_file, 'w', encoding='utf-8')
+        with f:
             json.dump(data, f, indent=2, ensure_ascii=False)
         print(f"Saved {output_file.name}")
     return aggregated_results, output_dir
@@ -24,7 +24,10 @@ class PdfParser(BaseParser):
         results = {}
         
         print(f"Found {len(pdf_files)} PDF files to process.")
-        print(f"DEBUG: Using POPPLER_PATH = {Config.POPPLER_PATH}")
+        if Config.POPPLER_FOUND:
+            print(f"DEBUG: Using POPPLER_PATH = {Config.POPPLER_PATH}")
+        else:
+            print(f"DEBUG: pdftoppm not found in {Config.POPPLER_PATH}, using Poppler from PATH")
 
         for pdf_file in pdf_files:
             part_id = pdf_file.stem
@@ -66,7 +69,8 @@ class PdfParser(BaseParser):
         
         # Convert PDF to images (only first page)
         try:
-            images = convert_from_path(str(pdf_path), poppler_path=Config.POPPLER_PATH)
+            poppler_path = Config.POPPLER_PATH if Config.POPPLER_FOUND else None
+            images = convert_from_path(str(pdf_path), poppler_path=poppler_path)
         except Exception as e:
             raise RuntimeError(f"Failed to convert PDF to image: {e}. Check Poppler path in config.py")
 
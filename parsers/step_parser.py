@@ -3,6 +3,7 @@ from pathlib import Path
 from typing import Dict, Any, Tuple, Optional
 from collections import defaultdict, Counter
 import numpy as np
+from config import STEP_MIN_FACE_AREA, STEP_PARALLEL_TOLERANCE
 
 try:
     from OCC.Core.STEPControl import STEPControl_Reader
@@ -23,8 +24,8 @@ except ImportError:
 class StepParser(BaseParser):
     """Parser for STEP files to extract geometric thickness."""
     
-    MIN_FACE_AREA = 10.0
-    PARALLEL_TOLERANCE = 0.01
+    MIN_FACE_AREA = STEP_MIN_FACE_AREA
+    PARALLEL_TOLERANCE = STEP_PARALLEL_TOLERANCE
     
     def parse(self) -> Dict[str, Any]:
         """Parse all STEP files in the data directory."""
@@ -80,12 +81,13 @@ class StepParser(BaseParser):
     def _extract_faces(self, shape):
         """Extract valid faces from shape."""
         faces = []
+        min_face_area = self.MIN_FACE_AREA
         explorer = TopExp_Explorer(shape, TopAbs_ShapeEnum(TopAbs_FACE), TopAbs_ShapeEnum(TopAbs_SHAPE))
         while explorer.More():
             face = topods.Face(explorer.Current())
             props = GProp_GProps()
             brepgprop.SurfaceProperties(face, props)
-            if props.Mass() >= self.MIN_FACE_AREA:
+            if props.Mass() >= min_face_area:
                 faces.append(face)
             explorer.Next()
         return faces
@@ -94,6 +96,7 @@ class StepParser(BaseParser):
         """Calculate thickness from faces."""
         all_distances = []
         face_pairs = []
+        parallel_tolerance = self.PARALLEL_TOLERANCE
         
         for i, face1 in enumerate(faces):
             # Check if planar
@@ -114,7 +117,7 @@ class StepParser(BaseParser):
                 normal2 = plane2.Axis().Direction()
                 
                 # Check parallelism
-                if abs(abs(normal1.Dot(normal2)) - 1.0) < self.PARALLEL_TOLERANCE:
+                if abs(abs(normal1.Dot(normal2)) - 1.0) < parallel_tolerance:
                     dist_calc = BRepExtrema_DistShapeShape(face1, face2)
                     dist_calc.Perform()
                     if dist_calc.IsDone():